@@ -1,63 +1,137 @@
 # app.py
 
-from flask import Flask, render_template, request, jsonify
-from automation.driver import iniciar_driver
-from automation.actions import login, fazer_recarga, imprimir_comprovante, set_margins
+from flask import Flask, render_template, request, jsonify, Response
+from automation.pool import DriverPool
+from automation.recharge import executar_recarga
+from automation.session_manager import SessionKeeper
+from automation.sheets_sync import SheetsSync
+from automation.card_lookup import ConsultaTitular
+from config import POOL_SIZE, QUEUE_CAPACITY, SHEETS_SYNC_ENABLED, EXECUTION_MODE, SPECULATIVE_VALIDATION
 from forms import RecargaForm
+from utils.job_queue import JobQueue, FilaCheia
+from utils.durable_queue import FilaDuravel
+from utils.task_store import TaskStore, ESTADOS_FINAIS
 from utils.logger import logger
-from automation.google_sheets import adicionar_recarga_txt
+from utils.metrics import metricas
+from utils.ledger import obter_ledger
+from utils.batch import Lote
+from utils.card_index import IndiceCartoes, TITULAR_DESCONHECIDO
+from werkzeug.datastructures import MultiDict
 import webbrowser
 import threading
 import os
+import csv
+import io
+import json
+import sqlite3
+import time
+from datetime import datetime
 import uuid # Para gerar IDs de tarefa únicos
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'uma-chave-secreta-de-fallback')
 
+# Tempo máximo (s) que um long-poll do /status fica aberto
+STATUS_MAX_WAIT = 30
+# Intervalo (s) entre comentários de keep-alive no stream SSE
+SSE_KEEPALIVE = 15
+
+# Pool de sessões do Chrome (cada recarga usa a sua); os navegadores sobem
+# em segundo plano no __main__, enquanto o Flask já atende
+pool = DriverPool()
+
+# No modo "workers" o app não abre navegadores: as recargas vão para a fila
+# em SQLite e os processos worker.py devolvem o resultado por ela
+MODO_WORKERS = EXECUTION_MODE == "workers"
+
+# Fila limitada de recargas; um worker por sessão do navegador
+if MODO_WORKERS:
+    fila = FilaDuravel(
+        lambda task_id, data, resultado: _concluir_recarga(task_id, data, resultado),
+        capacidade=QUEUE_CAPACITY,
+    )
+else:
+    fila = JobQueue(
+        lambda task_id, data: run_recharge_task(task_id, pool, data),
+        workers=POOL_SIZE,
+        capacidade=QUEUE_CAPACITY,
+    )
+
 # --- NOVO: Task Store ---
-# Um dicionário em memória para rastrear o estado das tarefas de recarga.
-# Em um app real/maior, usaríamos Redis ou um banco de dados.
-tasks = {}
+# Estado das tarefas de recarga (limitado, com validade e gravado em SQLite);
+# avisa o long-poll/SSE do /status no instante em que uma tarefa muda. No
+# modo "workers", as tarefas que seguem na fila continuam abertas ao reiniciar.
+tasks = TaskStore(em_andamento=fila.em_andamento if MODO_WORKERS else None)
+
+# Pinga as sessões ociosas e reloga as que expiraram
+mantenedor = SessionKeeper(pool)
+
+# Envia as recargas PIX do livro para o Google Sheets sem travar o worker
+sincronizador = SheetsSync()
+
+# Cartão → titular (alimentado pelas recargas) e validação antecipada nas sessões ociosas
+indice_cartoes = IndiceCartoes()
+consulta_titular = ConsultaTitular(pool, indice_cartoes, fila_ocupada=lambda: fila.estatisticas()['profundidade'] > 0,
+                                   ativo=SPECULATIVE_VALIDATION and not MODO_WORKERS)
+
+# Tempo máximo (s) que a consulta do titular espera pela validação antecipada
+CARTAO_MAX_WAIT = 10
+
+# Máximo de recargas num único /recarregar/lote
+LOTE_MAX_ITENS = 200
+# Tempo máximo (s) que cada recarga de um lote espera por espaço na fila
+LOTE_ESPERA_FILA = 600
+# Campos aceitos em cada item do lote (JSON ou colunas do CSV)
+CAMPOS_LOTE = ('numero_cartao', 'valor', 'forma_pagamento', 'nome_pagador')
+# Codificações tentadas no CSV, depois da informada no Content-Type: UTF-8 e,
+# como o Excel em português salva, Windows-1252 (latin-1 aceita qualquer byte)
+CODIFICACOES_CSV = ('utf-8-sig', 'cp1252', 'latin-1')
 
 # --- FUNÇÃO WORKER (EXECUTADA EM SEGUNDO PLANO) ---
-def run_recharge_task(task_id: str, driver_instance, form_data: dict):
+def run_recharge_task(task_id: str, pool_instance: DriverPool, form_data: dict):
     """
     Esta função executa a automação demorada do Selenium.
-    Ela atualiza o dicionário 'tasks' com o resultado.
+    Ela reserva uma sessão exclusiva do pool e atualiza o 'tasks' com o resultado.
     """
-    logger.info(f"Iniciando tarefa de recarga em background: {task_id}")
-    try:
-        # Extrai os dados do dicionário
-        forma_pagamento = form_data.get('forma_pagamento')
-        nome_pagador = form_data.get('nome_pagador')
-        numero_cartao = form_data.get('numero_cartao')
-        valor = form_data.get('valor')
+    _concluir_recarga(task_id, form_data, executar_recarga(task_id, pool_instance, form_data))
 
-        sucesso_recarga = fazer_recarga(driver_instance, forma_pagamento, numero_cartao, valor, nome_pagador)
 
-        if sucesso_recarga:
-            # Tenta imprimir e adicionar ao Google Sheets, mas não falha a tarefa inteira se isso der erro.
-            try:
-                imprimir_comprovante(driver_instance)
-            except Exception as e:
-                logger.error(f"TASK {task_id}: Erro ao imprimir comprovante: {e}")
-            
+def _concluir_recarga(task_id: str, form_data: dict, resultado: dict):
+    """
+    Registra o resultado de uma recarga, feita neste processo ou num
+    worker.py: livro de recargas (ou lote), índice de titulares, Sheets e,
+    por último, o estado da tarefa.
+    """
+    try:
+        if resultado['status'] == 'completed':
+            forma_pagamento = form_data.get('forma_pagamento')
+            nome_pagador = form_data.get('nome_pagador')
+            numero_cartao = form_data.get('numero_cartao')
+            titular = resultado.get('titular') or TITULAR_DESCONHECIDO
+            indice_cartoes.registrar(numero_cartao, titular)
+            # Registra no livro de recargas, mas não falha a tarefa inteira se isso der erro.
             try:
-                if forma_pagamento == "PIX":
-                    adicionar_recarga_txt(nome_pagador, valor, numero_cartao)
+                # Sem pagador informado, fica o titular do cartão (como o MCard mostrou)
+                nome_registro = nome_pagador or (titular if titular != TITULAR_DESCONHECIDO else "")
+                registro = (task_id, forma_pagamento, nome_registro, form_data.get('valor'), numero_cartao)
+                lote = form_data.get('lote')
+                if lote is not None:
+                    # Recarga de um lote: o livro e o Sheets são gravados de uma vez quando o lote termina
+                    lote.adicionar_registro(registro)
+                else:
+                    # Todas as formas de pagamento vão para o livro; o PIX segue depois para o Google Sheets
+                    with metricas.medir("ledger_registro"):
+                        obter_ledger().registrar(*registro)
+                    if forma_pagamento == "PIX":
+                        sincronizador.notificar()
             except Exception as e:
-                logger.error(f"TASK {task_id}: Erro ao adicionar no Google Sheets: {e}")
-            
-            # Atualiza o status da tarefa para sucesso
-            tasks[task_id] = {'status': 'completed', 'message': f"Recarga de R${valor} para o cartão {numero_cartao} concluída com sucesso!"}
-        else:
-            # Atualiza o status da tarefa para falha
-            tasks[task_id] = {'status': 'failed', 'message': "Falha ao processar recarga. O site pode ter retornado um erro."}
-            
-    except Exception as e:
-        logger.error(f"TASK {task_id}: Erro inesperado na automação: {e}")
-        tasks[task_id] = {'status': 'failed', 'message': f"Erro crítico durante a automação: {e}"}
-    logger.info(f"TASK {task_id}: Função da thread finalizada. Status final: {tasks.get(task_id, {}).get('status')}")
+                logger.error(f"TASK {task_id}: Erro ao registrar no livro de recargas: {e}")
+
+        tasks.definir(task_id, resultado['status'], resultado['message'])
+    finally:
+        if form_data.get('lote') is not None:
+            form_data['lote'].item_concluido()
+    logger.info(f"TASK {task_id}: Resultado registrado. Status final: {resultado['status']}")
 
 
 # --- ROTA PRINCIPAL (APENAS RENDERIZA A PÁGINA) ---
@@ -71,8 +145,8 @@ def index():
 @app.route("/recarregar", methods=["POST"])
 def recarregar():
     """
-    Recebe os dados, cria uma tarefa, inicia a execução em background
-    e retorna imediatamente um ID de tarefa.
+    Recebe os dados, cria uma tarefa, coloca na fila de execução em background
+    e retorna imediatamente um ID de tarefa (ou 503 se a fila estiver cheia).
     """
     data = request.get_json()
     
@@ -81,47 +155,347 @@ def recarregar():
         return jsonify({"success": False, "message": "Dados do formulário inválidos."}), 400
 
     task_id = str(uuid.uuid4())
-    tasks[task_id] = {'status': 'pending', 'message': 'Recarga em processamento...'}
-    
-    # Inicia a automação em uma thread separada para não bloquear a resposta
-    # NOTA: Passamos a instância global 'driver' para a thread.
-    # Em ambientes multi-usuário, isso seria um problema de concorrência.
-    # Para uma aplicação desktop local, é uma simplificação aceitável.
-    thread = threading.Thread(target=run_recharge_task, args=(task_id, driver, data))
-    thread.start()
-    
-    logger.info(f"Tarefa {task_id} criada para o cartão {data.get('numero_cartao')}.")
-    
+    tasks.definir(task_id, 'pending', 'Recarga em processamento...')
+
+    # Coloca a automação na fila; os workers (um por sessão do pool) executam
+    # em ordem de chegada, então recargas simultâneas nunca dividem a mesma aba.
+    try:
+        posicao = fila.enviar(task_id, data)
+    except FilaCheia as e:
+        tasks.remover(task_id)
+        logger.warning(f"Recarga recusada para o cartão {data.get('numero_cartao')}: {e}")
+        response = jsonify({"success": False, "message": "Muitas recargas em andamento. Aguarde alguns segundos e tente novamente."})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+
+    logger.info(f"Tarefa {task_id} criada para o cartão {data.get('numero_cartao')} (posição {posicao} na fila).")
+
     # Retorna o ID da tarefa para o frontend poder consultar o status
-    return jsonify({"success": True, "task_id": task_id}), 202
+    return jsonify({"success": True, "task_id": task_id, "posicao": posicao}), 202
+
+
+# --- ENDPOINT: TITULAR DO CARTÃO ---
+@app.route("/cartao/<numero>", methods=["GET"])
+def cartao(numero):
+    """
+    Titular do cartão pelo índice local, para a interface mostrar enquanto o
+    número é digitado. Se o cartão é desconhecido, uma sessão ociosa valida o
+    cartão no MCard em segundo plano; com ?wait=N espera até N segundos por ela.
+    """
+    if not numero.isdigit() or not 4 <= len(numero) <= 6:
+        return jsonify({'cartao': numero, 'titular': None, 'message': 'Cartão inválido.'}), 400
+
+    titular = indice_cartoes.obter(numero)
+    validando = False
+    if titular is None:
+        evento = consulta_titular.validar_em_segundo_plano(numero)
+        espera = min(request.args.get('wait', 0, type=float), CARTAO_MAX_WAIT)
+        if evento is not None and espera > 0 and evento.wait(espera):
+            titular = indice_cartoes.obter(numero)
+        validando = evento is not None and not evento.is_set()
+    return jsonify({'cartao': numero, 'titular': titular, 'validando': validando})
+
+
+# --- ENDPOINT: RECARGAS EM LOTE ---
+def _decodificar_csv(conteudo: bytes, charset: str = None) -> str:
+    """Decodifica o CSV pela primeira codificação que servir (sem o BOM do UTF-8)."""
+    for codificacao in ((charset,) if charset else ()) + CODIFICACOES_CSV:
+        try:
+            return conteudo.decode(codificacao).lstrip('\ufeff')
+        except (UnicodeDecodeError, LookupError):
+            continue
+
+
+def _ler_itens_lote():
+    """Lê a lista de recargas de um JSON (lista ou {"recargas": [...]}) ou de um CSV com cabeçalho."""
+    arquivo = request.files.get('arquivo')
+    if arquivo is not None or request.mimetype in ('text/csv', 'text/plain'):
+        conteudo = arquivo.read() if arquivo is not None else request.get_data()
+        texto = _decodificar_csv(conteudo, (arquivo or request).mimetype_params.get('charset'))
+        # Planilhas em português costumam exportar com ";" (e vírgula decimal)
+        delimitador = ';' if texto.split('\n', 1)[0].count(';') > texto.split('\n', 1)[0].count(',') else ','
+        return list(csv.DictReader(io.StringIO(texto), delimiter=delimitador))
+    dados = request.get_json(silent=True)
+    if isinstance(dados, dict):
+        dados = dados.get('recargas')
+    return dados if isinstance(dados, list) else None
+
+
+def _validar_item_lote(item):
+    """Aplica as regras do RecargaForm a um item e devolve (dados normalizados, erros)."""
+    if not isinstance(item, dict):
+        return None, {'item': ['Cada recarga deve ser um objeto com os campos do formulário.']}
+    dados = {campo: str(item.get(campo) or '').strip() for campo in CAMPOS_LOTE}
+    dados['forma_pagamento'] = dados['forma_pagamento'].upper()
+    dados['valor'] = dados['valor'].replace(',', '.')
+    form = RecargaForm(formdata=MultiDict(dados), meta={'csrf': False})
+    if not form.validate():
+        return None, {campo: erros for campo, erros in form.errors.items() if campo in CAMPOS_LOTE}
+    dados['valor'] = str(form.valor.data)
+    return dados, None
+
+
+def _finalizar_lote(registros):
+    """Grava no livro, num único commit, as recargas concluídas do lote e avisa o Sheets uma vez."""
+    if not registros:
+        return
+    try:
+        with metricas.medir("ledger_registro_lote"):
+            obter_ledger().registrar_lote(registros, aguardar=True)
+    except sqlite3.Error as e:
+        # O escritor do livro retém os registros e tenta de novo nos próximos commits
+        logger.error(f"Erro ao gravar o lote no livro de recargas ({e}); tentando de novo em segundo plano.")
+        obter_ledger().registrar_lote(registros)
+    if any(forma == "PIX" for _, forma, _, _, _ in registros):
+        sincronizador.notificar()
+
+
+def _enfileirar_lote(lote, itens):
+    """Coloca as recargas do lote na fila, esperando espaço quando ela enche (em vez de recusar)."""
+    for task_id, dados in itens:
+        try:
+            fila.enviar(task_id, {**dados, 'lote': lote}, bloquear=True, timeout=LOTE_ESPERA_FILA)
+        except FilaCheia:
+            tasks.definir(task_id, 'failed', "A fila ficou cheia por tempo demais; recarga não enviada.")
+            lote.item_concluido()
+        except Exception as e:
+            # Ex.: sqlite3.Error da fila; sem isso a thread morre e o lote nunca termina
+            logger.error(f"Lote {lote.lote_id}: erro ao enfileirar a recarga {task_id}: {e}")
+            tasks.definir(task_id, 'failed', "Erro ao enviar a recarga para a fila; recarga não enviada.")
+            lote.item_concluido()
+
+
+@app.route("/recarregar/lote", methods=["POST"])
+def recarregar_lote():
+    """
+    Recebe várias recargas (JSON ou CSV), valida todas antes de enviar
+    qualquer uma, distribui pelas sessões do navegador pela fila e devolve
+    o resultado de cada recarga assim que ela termina, em NDJSON (ou SSE com
+    Accept: text/event-stream). A última linha é o resumo do lote.
+    """
+    itens = _ler_itens_lote()
+    if not itens:
+        return jsonify({"success": False, "message": "Envie uma lista de recargas em JSON ou um CSV com cabeçalho."}), 400
+    if len(itens) > LOTE_MAX_ITENS:
+        return jsonify({"success": False, "message": f"Máximo de {LOTE_MAX_ITENS} recargas por lote."}), 400
+
+    validos, erros = [], []
+    for indice, item in enumerate(itens, start=1):
+        dados, erro = _validar_item_lote(item)
+        if erro:
+            erros.append({"linha": indice, "erros": erro})
+        else:
+            validos.append(dados)
+    if erros:
+        return jsonify({"success": False, "message": "Nenhuma recarga foi enviada: corrija os itens inválidos.",
+                        "erros": erros}), 400
+
+    lote = Lote(str(uuid.uuid4()), len(validos), _finalizar_lote)
+    itens_lote = [(str(uuid.uuid4()), dados) for dados in validos]
+    for task_id, dados in itens_lote:
+        tasks.definir(task_id, 'pending', 'Recarga em processamento...')
+    threading.Thread(target=_enfileirar_lote, args=(lote, itens_lote), name=f"lote-{lote.lote_id[:8]}",
+                     daemon=True).start()
+    logger.info(f"Lote {lote.lote_id} criado com {len(itens_lote)} recargas.")
+
+    sse = request.accept_mimetypes.best == "text/event-stream"
+
+    def formatar(evento):
+        corpo = json.dumps(evento, ensure_ascii=False)
+        return f"data: {corpo}\n\n" if sse else corpo + "\n"
+
+    def eventos():
+        inicio = time.monotonic()
+        indices = {task_id: indice for indice, (task_id, _) in enumerate(itens_lote, start=1)}
+        cartoes = {task_id: dados['numero_cartao'] for task_id, dados in itens_lote}
+        versoes = {task_id: 0 for task_id, _ in itens_lote}
+        contagem = {'completed': 0, 'failed': 0}
+        yield formatar({'lote_id': lote.lote_id, 'total': len(itens_lote),
+                        'task_ids': [task_id for task_id, _ in itens_lote]})
+        while versoes:
+            mudancas = tasks.aguardar_varias(versoes, timeout=SSE_KEEPALIVE)
+            if not mudancas:
+                yield ": keep-alive\n\n" if sse else "\n"
+                continue
+            for task_id, (task, versao) in mudancas.items():
+                task = task or {'status': 'failed', 'message': 'Tarefa não encontrada.'}
+                if task['status'] not in ESTADOS_FINAIS:
+                    versoes[task_id] = versao
+                    continue
+                del versoes[task_id]
+                contagem[task['status']] += 1
+                yield formatar({'indice': indices[task_id], 'task_id': task_id,
+                                'numero_cartao': cartoes[task_id], **task})
+        # Espera a gravação única do lote no livro antes do resumo
+        lote.concluido.wait(timeout=30)
+        yield formatar({'resumo': {'total': len(itens_lote), 'concluidas': contagem['completed'],
+                                   'falhas': contagem['failed'],
+                                   'duracao_segundos': round(time.monotonic() - inicio, 1)}})
+
+    return Response(eventos(), mimetype="text/event-stream" if sse else "application/x-ndjson",
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 
 # --- NOVO ENDPOINT: VERIFICAR STATUS DA TAREFA ---
+def _estado_com_posicao(task_id, task):
+    if task and task.get('status') == 'pending':
+        posicao = fila.posicao(task_id)
+        if posicao is not None:
+            return {**task, 'posicao': posicao}
+    return task
+
+
 @app.route("/status/<task_id>", methods=["GET"])
 def status(task_id):
     """
-    Endpoint para o frontend fazer polling e verificar o estado da tarefa.
+    Estado da tarefa. Com ?wait=N (segundos) vira long-poll: só responde quando
+    a tarefa termina ou quando o tempo acaba.
     """
-    task = tasks.get(task_id)
-    
-    logger.info(f"STATUS CHECK para TASK {task_id}: Status encontrado: {task.get('status') if task else 'Nenhum'}")
+    espera = min(request.args.get('wait', 0, type=float), STATUS_MAX_WAIT)
+    task, versao = tasks.aguardar(task_id, timeout=0)
+    limite = time.monotonic() + espera
+    while task and task['status'] not in ESTADOS_FINAIS and time.monotonic() < limite:
+        task, versao = tasks.aguardar(task_id, versao, timeout=limite - time.monotonic())
+
+    logger.debug(f"STATUS CHECK para TASK {task_id}: Status encontrado: {task.get('status') if task else 'Nenhum'}")
     if not task:
         return jsonify({'status': 'failed', 'message': 'Tarefa não encontrada.'}), 404
-        
-    return jsonify(task)
+
+    return jsonify(_estado_com_posicao(task_id, task))
+
+
+@app.route("/status/<task_id>/stream", methods=["GET"])
+def status_stream(task_id):
+    """
+    Stream SSE com o estado da tarefa: envia um evento a cada mudança
+    (inclusive de posição na fila) e fecha quando a tarefa termina.
+    """
+    def eventos():
+        versao, ultimo, silencio = 0, None, 0.0
+        while True:
+            task, versao = tasks.aguardar(task_id, versao, timeout=1)
+            atual = _estado_com_posicao(task_id, task) if task else {'status': 'failed', 'message': 'Tarefa não encontrada.'}
+            if atual != ultimo:
+                yield f"data: {json.dumps(atual)}\n\n"
+                ultimo, silencio = atual, 0.0
+            else:
+                silencio += 1
+                if silencio >= SSE_KEEPALIVE:
+                    yield ": keep-alive\n\n"
+                    silencio = 0.0
+            if atual['status'] in ESTADOS_FINAIS:
+                return
+
+    return Response(eventos(), mimetype="text/event-stream",
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+# --- ENDPOINT: ESTATÍSTICAS DA FILA ---
+@app.route("/fila", methods=["GET"])
+def fila_status():
+    """Profundidade da fila e tempos de espera, para dimensionar o número de sessões."""
+    return jsonify(fila.estatisticas())
+
+
+# --- ENDPOINT: ESTADO DA SINCRONIZAÇÃO COM O GOOGLE SHEETS ---
+@app.route("/sync", methods=["GET"])
+def sync_status():
+    return jsonify(sincronizador.estado())
+
+
+# --- ENDPOINT: ESTADO DO POOL DE NAVEGADORES ---
+@app.route("/pool", methods=["GET"])
+def pool_status():
+    """Mostra a saúde e a ocupação de cada sessão do Chrome."""
+    if MODO_WORKERS:
+        return jsonify({'workers': fila.workers_ativos(), 'validacao_antecipada': consulta_titular.estado()})
+    return jsonify({'sessoes': pool.estado(), 'keepalive': mantenedor.estado(),
+                    'validacao_antecipada': consulta_titular.estado()})
+
+
+# --- ENDPOINT: RESUMO DO DIA (FECHAMENTO DO CAIXA) ---
+@app.route("/resumo", methods=["GET"])
+def resumo():
+    """
+    Totais do dia (?data=AAAA-MM-DD, padrão hoje) por forma de pagamento e por
+    hora, PIX e DINHEIRO, direto da memória: sem ler o livro nem o Sheets.
+    """
+    data = request.args.get('data') or datetime.now().strftime("%Y-%m-%d")
+    try:
+        datetime.strptime(data, "%Y-%m-%d")
+    except ValueError:
+        return jsonify({'message': 'Use a data no formato AAAA-MM-DD.'}), 400
+    resumo_diario = obter_ledger().resumo
+    return jsonify({**resumo_diario.dia(data), 'dias': resumo_diario.dias()[-31:]})
+
+
+# --- ENDPOINT: TEMPOS DE ESPERA POR SELETOR ---
+@app.route("/esperas", methods=["GET"])
+def esperas():
+    """
+    Quanto cada elemento do MCard leva para aparecer (p50/p95/p99), quantas
+    esperas estouraram e o tempo limite que cada seletor está usando agora.
+    """
+    if MODO_WORKERS:
+        return jsonify({w['worker']: w.get('esperas', {}) for w in fila.workers_ativos()})
+    # Importa o Selenium só aqui, como o pool
+    from automation.waits import perfil_esperas
+    return jsonify(perfil_esperas.estado())
+
+
+# --- ENDPOINT: MÉTRICAS ---
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Contadores e histogramas de latência por etapa no formato texto do Prometheus."""
+    return Response(metricas.prometheus(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/metrics.json", methods=["GET"])
+def metrics_json():
+    """Resumo das métricas com p50/p95/p99 por etapa."""
+    return jsonify(metricas.resumo())
+
+
+# --- ENDPOINT: PRONTIDÃO (NAVEGADORES LOGADOS) ---
+@app.route("/pronto", methods=["GET"])
+def pronto():
+    """
+    200 quando há pelo menos uma sessão do navegador logada; 503 enquanto os
+    navegadores ainda estão subindo (a interface mostra "iniciando").
+    """
+    if MODO_WORKERS:
+        workers = fila.workers_ativos()
+        prontas = sum(w['sessoes_prontas'] for w in workers)
+        corpo = {'pronto': prontas > 0, 'sessoes_prontas': prontas, 'workers': len(workers),
+                 'iniciando': any(w['iniciando'] for w in workers)}
+        return jsonify(corpo), 200 if prontas else 503
+    prontas = pool.prontas()
+    corpo = {'pronto': prontas > 0, 'sessoes_prontas': prontas, 'sessoes_total': pool.tamanho,
+             'iniciando': pool.iniciando}
+    return jsonify(corpo), 200 if prontas else 503
 
 
 # Função para abrir o navegador (sem mudanças)
 def open_browser():
     webbrowser.open_new("http://127.0.0.1:5000")
 
-if __name__ == "__main__":
-    driver = iniciar_driver()
-    set_margins(driver)
+def iniciar_navegadores():
+    if not pool.iniciar():
+        # O pool continua tentando subir as sessões em segundo plano
+        logger.error("NÃO FOI POSSÍVEL FAZER LOGIN. Tentando de novo em segundo plano.")
 
-    if not login(driver):
-        logger.error("NÃO FOI POSSÍVEL FAZER LOGIN. O APLICATIVO NÃO FUNCIONARÁ.")
-        # Poderíamos até fechar o app aqui, mas vamos deixar rodando para debug.
+if __name__ == "__main__":
+    # Os navegadores sobem e fazem login em paralelo, enquanto o Flask já atende;
+    # recargas enviadas antes disso esperam na fila por uma sessão pronta.
+    # No modo "workers" quem abre os navegadores são os processos worker.py.
+    if not MODO_WORKERS:
+        threading.Thread(target=iniciar_navegadores, name="pool-boot", daemon=True).start()
+        mantenedor.iniciar()
+    # Abre o livro (e monta os totais do /resumo a partir dele) sem atrasar o Flask
+    threading.Thread(target=obter_ledger, name="ledger-boot", daemon=True).start()
+    fila.iniciar()
+    if SHEETS_SYNC_ENABLED:
+        sincronizador.iniciar()
     
     threading.Timer(1.5, open_browser).start()
     
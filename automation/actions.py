@@ -1,10 +1,44 @@
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait, Select
+from selenium.webdriver.support.ui import Select
 from selenium.webdriver.common.keys import Keys
-from time import sleep
-from config import MCARD_LOGIN, MCARD_SENHA, MCARD_URL
+from time import sleep, time
+from pathlib import Path
+import base64
+import os
+import shlex
+import subprocess
+from automation.waits import SOMBRA, chave, esperar, esperar_janelas, esperar_um_de, perfil_esperas
+from config import (MCARD_LOGIN, MCARD_SENHA, MCARD_URL, PRINT_MODE, PRINT_COMMAND, PRINT_DIR, FILL_MODE,
+                    WAIT_CONFIRM_MIN_TIMEOUT)
+from utils.card_index import TITULAR_DESCONHECIDO
 from utils.logger import logger
+from utils.metrics import metricas
+
+# Substitui window.print por um aviso: o comprovante é impresso via DevTools, sem diálogo
+SCRIPT_INTERCEPTA_PRINT = """
+if (!window.__printOriginal) {
+    window.__printOriginal = window.print;
+    window.__printSolicitado = false;
+    window.print = function () { window.__printSolicitado = true; };
+}
+"""
+
+# Botão de confirmar que aparece depois do Validar (a espera que mais pesa na recarga).
+# Antes de cada Validar, o botão e o nome do titular que já estão na página
+# recebem a marca data-visto: só um botão novo, da validação atual, é clicado.
+BOTAO_CONFIRMAR = (By.CSS_SELECTOR, "#btn-maisCredito:not([data-visto])")
+NOME_TITULAR = (By.XPATH, "//div[contains(@class, 'col-md-4')]/span[not(@data-visto)]")
+# O botão de confirmar nunca usa um tempo limite curto: quando a espera estoura, a
+# recarga falha e a aba volta ao formulário (recarregar_formulario)
+perfil_esperas.definir_piso(chave(BOTAO_CONFIRMAR), WAIT_CONFIRM_MIN_TIMEOUT)
+SCRIPT_MARCAR_VISTOS = (
+    "document.querySelectorAll(\"#btn-maisCredito, div[class*='col-md-4'] > span\")"
+    ".forEach(el => el.setAttribute('data-visto', ''));"
+)
+MENU_RECARGA = (By.ID, 'manip2')
+# Diálogo de impressão do Chrome: componentes aninhados em shadow roots
+PREVIEW_SIDEBAR = "print-preview-app >>> print-preview-sidebar"
+BOTAO_IMPRIMIR = (SOMBRA, PREVIEW_SIDEBAR + " >>> print-preview-button-strip >>> .action-button")
 
 def login(driver):
     """Realiza login no MCard usando credenciais do .env."""
@@ -12,64 +46,292 @@ def login(driver):
         logger.info("Acessando o site...")
         driver.get(MCARD_URL)
 
-        wait = WebDriverWait(driver, 15)
-        campo_login = wait.until(EC.presence_of_element_located((By.NAME, 'login')))
+        # Com perfil persistente (CHROME_PROFILE_DIR) o cookie pode ainda estar valendo
+        indice, elemento = esperar_um_de(driver, [(By.NAME, 'login'), MENU_RECARGA])
+        if indice == 1:
+            elemento.click()
+            logger.info("Sessão do MCard ainda válida no perfil do navegador; login dispensado.")
+            return True
+        campo_login = elemento
         campo_login.clear()
         campo_login.send_keys(MCARD_LOGIN + Keys.TAB + MCARD_SENHA + Keys.ENTER)
 
         # Aguarda tela principal carregar
-        wait.until(EC.presence_of_element_located((By.ID, 'manip2'))).click()
+        esperar(driver, MENU_RECARGA).click()
         logger.info("Login realizado com sucesso!")
         return True
     except Exception as e:
         logger.error(f"Erro no login: {e}")
         return False
 
+def sessao_expirada(driver):
+    """
+    Confere, numa única chamada, se o MCard pediu login de novo: um campo
+    'login' em qualquer lugar da página, inclusive dentro do formulário da
+    recarga (o Validar por AJAX injeta a tela de login no resultado).
+    """
+    return driver.execute_script("return !!document.querySelector(\"input[name='login']\");")
+
+def recarregar_formulario(driver):
+    """
+    Volta ao formulário da recarga pelo menu, como o MCard o entrega,
+    descartando o resultado de um Validar (inclusive uma resposta atrasada
+    que ainda chegaria nesta aba). Devolve False se o navegador ou o MCard
+    não respondeu.
+    """
+    try:
+        driver.get(MCARD_URL)
+        esperar(driver, MENU_RECARGA).click()
+        return True
+    except Exception as e:
+        logger.error(f"Não foi possível voltar ao formulário da recarga: {e}")
+        return False
+
+# Keep-alive: GET na página inicial do MCard com os cookies da sessão, sem navegar.
+# Argumento: a URL. Devolve {status (0 se a requisição falhou), redirecionada, login}.
+SCRIPT_KEEPALIVE = """
+const [url, done] = arguments;
+fetch(url, {credentials: 'include', cache: 'no-store'})
+    .then(r => r.text().then(corpo => done({
+        status: r.status,
+        redirecionada: r.redirected,
+        login: /<input[^>]*name=["']?login["'\\s>]/i.test(corpo),
+    })))
+    .catch(() => done({status: 0, redirecionada: false, login: false}));
+"""
+
+def manter_sessao(driver, timeout=10):
+    """
+    Keep-alive barato: busca a página inicial do MCard (MCARD_URL, com os
+    cookies da sessão) para renovar o tempo de inatividade no servidor, sem
+    navegar. Nunca repete a página em que a aba está, que pode ser o
+    resultado de um POST (ex.: a confirmação de uma recarga). Devolve
+    {'status', 'redirecionada', 'login'}: um redirecionamento ou a tela de
+    login na resposta indicam que a sessão do MCard caiu.
+    """
+    driver.set_script_timeout(timeout)
+    return driver.execute_async_script(SCRIPT_KEEPALIVE, MCARD_URL)
+
+# Preenche, valida e confirma a recarga numa única chamada ao navegador.
+# Argumentos: forma de pagamento, cartão, valor, timeout (ms) para o botão de confirmar.
+# Devolve {ok, nome} ou {ok: false, layout: true} se a página não tem os campos esperados.
+SCRIPT_RECARGA = """
+const [forma, cartao, valor, timeoutMs, done] = arguments;
+const porXPath = (xp) => document.evaluate(xp, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+const campos = {
+    tipoPg: document.getElementById('tipoPg'),
+    nrcartaocredito: document.getElementById('nrcartaocredito'),
+    acrescido: document.getElementById('acrescido'),
+    pagocredito: document.getElementById('pagocredito'),
+    validar: porXPath("//button[text()='Validar']"),
+};
+const faltando = Object.keys(campos).filter(k => !campos[k] && (k !== 'tipoPg' || forma === 'PIX'));
+if (faltando.length) {
+    return done({ok: false, layout: true, erro: 'Campos ausentes: ' + faltando.join(', ')});
+}
+const setter = Object.getOwnPropertyDescriptor(HTMLInputElement.prototype, 'value').set;
+const disparar = (el, tipos) => tipos.forEach(t => el.dispatchEvent(new Event(t, {bubbles: true})));
+const preencher = (el, v) => {
+    el.focus();
+    setter.call(el, v);
+    disparar(el, ['input', 'keyup', 'change', 'blur']);
+};
+if (forma === 'PIX') {
+    campos.tipoPg.value = '1';
+    disparar(campos.tipoPg, ['input', 'change']);
+}
+preencher(campos.nrcartaocredito, cartao);
+preencher(campos.acrescido, valor);
+preencher(campos.pagocredito, valor);
+
+// Resultado de um Validar anterior (ex.: resposta atrasada) não vale para este cartão
+document.querySelectorAll("#btn-maisCredito, div[class*='col-md-4'] > span").forEach(el => el.setAttribute('data-visto', ''));
+const confirmar = (botao) => {
+    const span = porXPath("//div[contains(@class, 'col-md-4')]/span[not(@data-visto)]");
+    setTimeout(() => botao.click(), 100);
+    done({ok: true, nome: span ? span.textContent.trim() : '', espera: (performance.now() - inicio) / 1000});
+};
+const observer = new MutationObserver(() => {
+    const botao = document.querySelector('#btn-maisCredito:not([data-visto])');
+    if (botao) {
+        observer.disconnect();
+        clearTimeout(limite);
+        confirmar(botao);
+    }
+});
+const limite = setTimeout(() => {
+    observer.disconnect();
+    done({ok: false, erro: 'Botão de confirmação não apareceu após validar.'});
+}, timeoutMs);
+observer.observe(document.documentElement, {childList: true, subtree: true, attributes: true});
+const inicio = performance.now();
+campos.validar.click();
+"""
+
 def fazer_recarga(driver, forma_pagamento, numero_cartao, valor, nome_pagador=""):
-    """Realiza a recarga no MCard."""
+    """
+    Realiza a recarga no MCard. No modo FILL_MODE="script" tudo acontece numa
+    única chamada ao navegador; se a página não tiver o layout esperado, cai
+    no preenchimento passo a passo.
+
+    Devolve o nome do titular do cartão mostrado pelo MCard (ou
+    TITULAR_DESCONHECIDO) em caso de sucesso e False em caso de falha.
+    """
+    if FILL_MODE == "script":
+        resultado = _fazer_recarga_script(driver, forma_pagamento, numero_cartao, valor, nome_pagador)
+        if resultado is not None:
+            return resultado
+        logger.info("Layout da página diferente do esperado; usando o preenchimento passo a passo.")
+    return _fazer_recarga_passos(driver, forma_pagamento, numero_cartao, valor, nome_pagador)
+
+def _fazer_recarga_script(driver, forma_pagamento, numero_cartao, valor, nome_pagador="", timeout=None):
+    """Devolve o titular (sucesso) ou False, ou None se for preciso usar o passo a passo."""
+    # A espera pelo botão de confirmar usa (e alimenta) o histórico do mesmo seletor do passo a passo
+    timeout = timeout or perfil_esperas.tempo_limite(chave(BOTAO_CONFIRMAR))
+    try:
+        logger.info(f"Iniciando recarga (script) - Cartão: {numero_cartao}, Valor: {valor}, Forma: {forma_pagamento}")
+        driver.set_script_timeout(timeout + 5)
+        with metricas.medir("recarga_script"):
+            resultado = driver.execute_async_script(
+                SCRIPT_RECARGA, forma_pagamento, str(numero_cartao), str(valor), int(timeout * 1000)
+            )
+    except Exception as e:
+        # Ex.: o Validar recarregou a página no meio do script; se o botão de
+        # confirmar já está lá, termina pelo caminho tradicional
+        if driver.find_elements(*BOTAO_CONFIRMAR):
+            return _confirmar_recarga(driver, nome_pagador)
+        logger.error(f"Erro ao realizar recarga (script): {e}")
+        return False
+
+    if resultado.get("layout"):
+        logger.info(f"Preenchimento por script indisponível: {resultado.get('erro')}")
+        return None
+    if not resultado.get("ok"):
+        perfil_esperas.registrar_falha(chave(BOTAO_CONFIRMAR))
+        logger.error(f"Erro ao realizar recarga: {resultado.get('erro')}")
+        return False
+
+    perfil_esperas.registrar_sucesso(chave(BOTAO_CONFIRMAR), resultado.get("espera", 0))
+    titular = resultado.get("nome") or TITULAR_DESCONHECIDO
+    logger.info(f"Recarga concluída para {nome_pagador or titular}")
+    return titular
+
+def _fazer_recarga_passos(driver, forma_pagamento, numero_cartao, valor, nome_pagador=""):
+    """Realiza a recarga no MCard campo a campo (um comando do WebDriver por ação)."""
     try:
         logger.info(f"Iniciando recarga - Cartão: {numero_cartao}, Valor: {valor}, Forma: {forma_pagamento}")
 
-        wait = WebDriverWait(driver, 15)
+        with metricas.medir("recarga_preenchimento"):
+            if forma_pagamento == "PIX":
+                Select(driver.find_element("id", "tipoPg")).select_by_value("1")
 
-        if forma_pagamento == "PIX":
-            Select(driver.find_element("id", "tipoPg")).select_by_value("1")
-        
-        # Preencher número do cartão
-        campo_cartao = wait.until(EC.presence_of_element_located((By.ID, 'nrcartaocredito')))
-        campo_cartao.clear()
-        campo_cartao.send_keys(numero_cartao)
+            # Preencher número do cartão
+            campo_cartao = esperar(driver, (By.ID, 'nrcartaocredito'))
+            campo_cartao.clear()
+            campo_cartao.send_keys(numero_cartao)
 
-        # Preencher valor
-        campo_acrescido = driver.find_element(By.ID, 'acrescido')
-        campo_pagocredito = driver.find_element(By.ID, 'pagocredito')
+            # Preencher valor
+            campo_acrescido = driver.find_element(By.ID, 'acrescido')
+            campo_pagocredito = driver.find_element(By.ID, 'pagocredito')
 
-        campo_acrescido.clear()
-        campo_acrescido.send_keys(str(valor))
-        campo_pagocredito.clear()
-        campo_pagocredito.send_keys(str(valor))
+            campo_acrescido.clear()
+            campo_acrescido.send_keys(str(valor))
+            campo_pagocredito.clear()
+            campo_pagocredito.send_keys(str(valor))
 
-        # Validar
-        driver.find_element(By.XPATH, "//button[text()='Validar']").click()
+        # Validar (o resultado de uma validação anterior fica marcado e não é confundido com o desta)
+        with metricas.medir("recarga_validar_clique"):
+            driver.execute_script(SCRIPT_MARCAR_VISTOS)
+            driver.find_element(By.XPATH, "//button[text()='Validar']").click()
 
+        return _confirmar_recarga(driver, nome_pagador)
+    except Exception as e:
+        logger.error(f"Erro ao realizar recarga: {e}")
+        return False
+
+def _confirmar_recarga(driver, nome_pagador=""):
+    """Espera o botão de confirmar após o Validar, captura o nome e confirma."""
+    try:
         # Botão de confirmar
-        confirm_button = wait.until(EC.presence_of_element_located((By.ID, 'btn-maisCredito')))
+        with metricas.medir("recarga_espera_validacao"):
+            confirm_button = esperar(driver, BOTAO_CONFIRMAR)
 
-        # Captura nome do pagador se não foi informado
-        if not nome_pagador:
+        with metricas.medir("recarga_confirmacao"):
+            # Captura o nome do titular do cartão (também usado quando o pagador não foi informado)
             try:
-                nome_pagador = driver.find_element(By.XPATH, "//div[contains(@class, 'col-md-4')]/span").text
+                titular = driver.find_element(*NOME_TITULAR).text.strip()
             except:
-                nome_pagador = "Desconhecido"
+                titular = ""
+            titular = titular or TITULAR_DESCONHECIDO
 
-        driver.execute_script("setTimeout(() => arguments[0].click(), 100);", confirm_button)
+            driver.execute_script("setTimeout(() => arguments[0].click(), 100);", confirm_button)
 
-        logger.info(f"Recarga concluída para {nome_pagador}")
-        return True
+        logger.info(f"Recarga concluída para {nome_pagador or titular}")
+        return titular
     except Exception as e:
         logger.error(f"Erro ao realizar recarga: {e}")
         return False
 
+# Valida só o cartão (Validar não altera nada no MCard) para descobrir o titular.
+# A página fica com o resultado; quem chama recarrega o formulário depois.
+# Argumentos: cartão, valor provisório, timeout (ms). Devolve o nome, '' ou null (layout).
+SCRIPT_VALIDAR_CARTAO = """
+const [cartao, valor, timeoutMs, done] = arguments;
+const porXPath = (xp) => document.evaluate(xp, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+const campos = ['nrcartaocredito', 'acrescido', 'pagocredito'].map(id => document.getElementById(id));
+const validar = porXPath("//button[text()='Validar']");
+if (campos.some(c => !c) || !validar || document.getElementById('btn-maisCredito')) {
+    return done(null);
+}
+const setter = Object.getOwnPropertyDescriptor(HTMLInputElement.prototype, 'value').set;
+const preencher = (el, v) => {
+    setter.call(el, v);
+    ['input', 'keyup', 'change', 'blur'].forEach(t => el.dispatchEvent(new Event(t, {bubbles: true})));
+};
+preencher(campos[0], cartao);
+preencher(campos[1], valor);
+preencher(campos[2], valor);
+const terminar = (nome) => {
+    observer.disconnect();
+    clearTimeout(limite);
+    done(nome);
+};
+const observer = new MutationObserver(() => {
+    if (document.getElementById('btn-maisCredito')) {
+        const span = porXPath("//div[contains(@class, 'col-md-4')]/span");
+        terminar(span ? span.textContent.trim() : '');
+    }
+});
+const limite = setTimeout(() => terminar(''), timeoutMs);
+observer.observe(document.documentElement, {childList: true, subtree: true, attributes: true});
+validar.click();
+"""
+
+# Valor provisório usado só para o Validar especulativo
+VALOR_VALIDACAO = "1"
+
+def validar_cartao(driver, numero_cartao, timeout=None):
+    """
+    Preenche o cartão e clica em Validar sem confirmar, só para ler o nome do
+    titular. Devolve o nome ou None. Depois volta ao formulário da recarga
+    pelo menu, como o MCard o entrega, para a próxima recarga nesta aba não
+    encontrar o resultado desta validação.
+    """
+    timeout = timeout or perfil_esperas.tempo_limite(chave(BOTAO_CONFIRMAR))
+    driver.set_script_timeout(timeout + 5)
+    try:
+        with metricas.medir("validacao_especulativa"):
+            titular = driver.execute_async_script(
+                SCRIPT_VALIDAR_CARTAO, str(numero_cartao), VALOR_VALIDACAO, int(timeout * 1000)
+            )
+    except Exception as e:
+        logger.info(f"Validação especulativa interrompida ({e}); voltando ao formulário.")
+        titular = None
+    with metricas.medir("validacao_especulativa_recarregar"):
+        if not recarregar_formulario(driver):
+            raise RuntimeError("A aba não voltou ao formulário da recarga.")
+    return titular or None
+
 def set_margins(driver, margin_value: str = "1", timeout: int = 10) -> None:
     """
     Abre o diálogo de impressão do Chrome, expande 'Mais configurações',
@@ -80,7 +342,6 @@ def set_margins(driver, margin_value: str = "1", timeout: int = 10) -> None:
         margin_value: valor da margem no seletor (ex.: "0"=Padrão, "1"=Sem margens, etc. depende do Chrome).
         timeout: tempo máximo (s) para esperas explícitas.
     """
-    wait = WebDriverWait(driver, timeout)
     original_handles = set(driver.window_handles)
     original_handle = driver.current_window_handle
 
@@ -88,36 +349,25 @@ def set_margins(driver, margin_value: str = "1", timeout: int = 10) -> None:
     driver.execute_script("setTimeout(() => window.print(), 100);")
 
     # Aguarda a nova janela/aba do preview
-    wait.until(lambda d: len(d.window_handles) > len(original_handles))
-    new_handle = next(iter(set(driver.window_handles) - original_handles))
+    janelas = esperar_janelas(driver, len(original_handles) + 1, timeout, nome="janela_impressao")
+    new_handle = next(iter(set(janelas) - original_handles))
 
     try:
         driver.switch_to.window(new_handle)
 
-        # 1) Raiz do preview
-        host = wait.until(EC.presence_of_element_located((By.TAG_NAME, "print-preview-app")))
-        sr1 = host.shadow_root  # Shadow root do print-preview-app
-
-        # 2) Sidebar
-        sidebar = wait.until(lambda d: sr1.find_element(By.CSS_SELECTOR, "print-preview-sidebar"))
-        sr2 = sidebar.shadow_root
-
-        # 3) "Mais configurações" (expandir)
-        more_settings = wait.until(lambda d: sr2.find_element(By.CSS_SELECTOR, "print-preview-more-settings"))
-        sr3 = more_settings.shadow_root
-        expand_label = wait.until(lambda d: sr3.find_element(By.CSS_SELECTOR, "cr-expand-button #label"))
+        # 1) "Mais configurações" (expandir), dentro do print-preview-app e da sidebar
+        sidebar = f"{PREVIEW_SIDEBAR} >>> "
+        expand_label = esperar(driver, (SOMBRA, sidebar + "print-preview-more-settings >>> cr-expand-button #label"), timeout)
         expand_label.click()
 
-        # 4) Margens: localizar o select real dentro do componente e escolher o valor
-        margins_sr = wait.until(lambda d: sr2.find_element(By.CSS_SELECTOR, "print-preview-margins-settings")).shadow_root
+        # 2) Margens: localizar o select real dentro do componente e escolher o valor
         # Busca um <select> interno (mais estável do que classe genérica)
-        select_el = wait.until(lambda d: margins_sr.find_element(By.CSS_SELECTOR, "select"))
+        select_el = esperar(driver, (SOMBRA, sidebar + "print-preview-margins-settings >>> select"), timeout)
         Select(select_el).select_by_value(margin_value)
 
-        # 5) Botões do rodapé (Cancelar / Imprimir)
-        btn_strip_sr = wait.until(lambda d: sr2.find_element(By.CSS_SELECTOR, "print-preview-button-strip")).shadow_root
-        cancel_btn = wait.until(lambda d: btn_strip_sr.find_element(By.CSS_SELECTOR, "cr-button.cancel-button"))
-        # print_btn = btn_strip_sr.find_element(By.CSS_SELECTOR, "cr-button.action-button")  # se precisar
+        # 3) Botões do rodapé (Cancelar / Imprimir)
+        cancel_btn = esperar(driver, (SOMBRA, sidebar + "print-preview-button-strip >>> cr-button.cancel-button"), timeout)
+        # print_btn: mesmo caminho com "cr-button.action-button"  # se precisar
         cancel_btn.click()
 
     finally:
@@ -127,21 +377,10 @@ def set_margins(driver, margin_value: str = "1", timeout: int = 10) -> None:
 def imprimir_comprovante(driver):
     """Simula clique no botão de imprimir."""
     try:
-        wait = WebDriverWait(driver, 15)
-        all_windows = driver.window_handles
-        while len(all_windows) <= 1:
-            all_windows = driver.window_handles
-            sleep(0.3)
+        all_windows = esperar_janelas(driver, 2, nome="janela_impressao")
         driver.switch_to.window(all_windows[1])
 
-        wait.until(EC.presence_of_element_located((By.TAG_NAME, "print-preview-app")))
-        host_element = driver.find_element(By.TAG_NAME, "print-preview-app")
-        shadow_root_1 = driver.execute_script("return arguments[0].shadowRoot", host_element)
-        inner_host_1 = shadow_root_1.find_element(By.CSS_SELECTOR, "print-preview-sidebar")
-        shadow_root_2 = driver.execute_script("return arguments[0].shadowRoot", inner_host_1)
-        inner_host_2 = shadow_root_2.find_element(By.CSS_SELECTOR, "print-preview-button-strip")
-        shadow_root_3 = driver.execute_script("return arguments[0].shadowRoot", inner_host_2)
-        button = shadow_root_3.find_element(By.CLASS_NAME, "action-button")
+        button = esperar(driver, BOTAO_IMPRIMIR)
         button.click()
 
         driver.switch_to.window(all_windows[0])
@@ -150,3 +389,86 @@ def imprimir_comprovante(driver):
     except Exception as e:
         logger.error(f"Erro ao imprimir comprovante: {e}")
         return False
+
+def preparar_impressao_cdp(driver):
+    """
+    Instala a interceptação do window.print na aba atual e em todas as páginas
+    que ela carregar depois (Page.addScriptToEvaluateOnNewDocument).
+    """
+    driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": SCRIPT_INTERCEPTA_PRINT})
+    driver.execute_script(SCRIPT_INTERCEPTA_PRINT)
+
+def _enviar_para_impressora(caminho):
+    """Dispara o PRINT_COMMAND em segundo plano (o spool do sistema cuida do resto)."""
+    if not PRINT_COMMAND:
+        return
+    comando = [parte.replace("{arquivo}", str(caminho))
+               for parte in shlex.split(PRINT_COMMAND, posix=os.name != "nt")]
+    subprocess.Popen(comando, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def imprimir_comprovante_cdp(driver, timeout=15):
+    """
+    Espera a página pedir a impressão (window.print interceptado), gera o PDF
+    do comprovante com Page.printToPDF (sem margens) e envia para a impressora.
+    Devolve False se a página abriu o diálogo de impressão mesmo assim.
+    """
+    janelas_antes = len(driver.window_handles)
+    limite = time() + timeout
+    while not driver.execute_script("return window.__printSolicitado === true;"):
+        if len(driver.window_handles) > janelas_antes:
+            return False
+        if time() > limite:
+            raise TimeoutError("A página não pediu a impressão do comprovante.")
+        sleep(0.05)
+    driver.execute_script("window.__printSolicitado = false;")
+    _gerar_pdf(driver)
+    return True
+
+def _gerar_pdf(driver):
+    """Gera o PDF da aba atual com Page.printToPDF (sem margens) e envia para a impressora."""
+    pdf = driver.execute_cdp_cmd("Page.printToPDF", {
+        "printBackground": True,
+        "preferCSSPageSize": True,
+        "marginTop": 0, "marginBottom": 0, "marginLeft": 0, "marginRight": 0,
+    })
+    pasta = Path(PRINT_DIR)
+    pasta.mkdir(parents=True, exist_ok=True)
+    caminho = pasta / f"comprovante_{time():.3f}.pdf"
+    caminho.write_bytes(base64.b64decode(pdf["data"]))
+    _enviar_para_impressora(caminho.resolve())
+    logger.info(f"Comprovante gerado via DevTools: {caminho}")
+    return caminho
+
+def imprimir_html(driver, html):
+    """
+    Imprime via DevTools um comprovante recebido por HTTP (motor HTTP): abre o
+    HTML numa aba temporária, gera o PDF e volta para a aba do MCard.
+    """
+    original = driver.current_window_handle
+    driver.switch_to.new_window("tab")
+    try:
+        preparar_impressao_cdp(driver)
+        # <base> para CSS/imagens relativos do MCard continuarem funcionando
+        html = f'<base href="{MCARD_URL}">' + html
+        driver.get("data:text/html;charset=utf-8;base64," + base64.b64encode(html.encode("utf-8")).decode())
+        _gerar_pdf(driver)
+        return True
+    except Exception as e:
+        logger.error(f"Erro ao imprimir comprovante: {e}")
+        return False
+    finally:
+        driver.close()
+        driver.switch_to.window(original)
+
+def imprimir(driver):
+    """Imprime o comprovante no modo configurado (PRINT_MODE), caindo no diálogo do Chrome se preciso."""
+    if PRINT_MODE == "cdp":
+        try:
+            if imprimir_comprovante_cdp(driver):
+                return True
+            logger.info("A página abriu o diálogo de impressão; seguindo pelo fluxo antigo.")
+        except Exception as e:
+            logger.error(f"Erro ao imprimir via DevTools: {e}; usando o diálogo de impressão.")
+            # O pedido de impressão foi interceptado: reabre o diálogo original para o fluxo antigo
+            driver.execute_script("if (window.__printOriginal) { setTimeout(() => window.__printOriginal(), 100); }")
+    return imprimir_comprovante(driver)
@@ -0,0 +1,68 @@
+import threading
+
+from automation.pool import PoolEsgotado
+from automation.session_manager import garantir_login
+from config import SPECULATIVE_VALIDATION
+from utils.logger import logger
+
+
+class ConsultaTitular:
+    """
+    Descobre o titular de um cartão enquanto o número ainda está sendo
+    digitado: primeiro no índice local; se o cartão é desconhecido, uma
+    sessão ociosa do pool faz um Validar especulativo em segundo plano e o
+    nome lido entra no índice. Nunca espera por sessão: se todas estão
+    ocupadas (ou há recargas na fila), a consulta simplesmente não acontece.
+    """
+
+    def __init__(self, pool, indice, fila_ocupada=lambda: False, ativo: bool = SPECULATIVE_VALIDATION):
+        self.pool = pool
+        self.indice = indice
+        self.ativo = ativo
+        self._fila_ocupada = fila_ocupada
+        self._lock = threading.Lock()
+        self._em_andamento = {}  # cartão -> threading.Event
+        self.validacoes = 0
+        self.encontrados = 0
+
+    def validar_em_segundo_plano(self, cartao: str):
+        """Dispara (ou reaproveita) a validação do cartão; devolve um Event ou None se não houve como."""
+        if not self.ativo:
+            return None
+        with self._lock:
+            if cartao in self._em_andamento:
+                return self._em_andamento[cartao]
+            if self._fila_ocupada():
+                return None
+            try:
+                sessao = self.pool.checkout(timeout=0)
+            except PoolEsgotado:
+                return None
+            evento = self._em_andamento[cartao] = threading.Event()
+        threading.Thread(target=self._validar, args=(sessao, cartao, evento),
+                         name=f"validar-{cartao}", daemon=True).start()
+        return evento
+
+    def _validar(self, sessao, cartao, evento) -> None:
+        from automation.actions import validar_cartao
+
+        try:
+            garantir_login(sessao)
+            titular = validar_cartao(sessao.driver, cartao)
+            self.validacoes += 1
+            if titular:
+                self.encontrados += 1
+                self.indice.registrar(cartao, titular)
+                logger.info(f"SESSÃO {sessao.indice}: Cartão {cartao} pertence a {titular} (validação antecipada).")
+        except Exception as e:
+            logger.error(f"SESSÃO {sessao.indice}: Erro na validação antecipada do cartão {cartao}: {e}")
+            sessao.registrar_falha()
+        finally:
+            self.pool.checkin(sessao)
+            with self._lock:
+                self._em_andamento.pop(cartao, None)
+            evento.set()
+
+    def estado(self) -> dict:
+        return {"ativo": self.ativo, "cartoes_no_indice": len(self.indice),
+                "validacoes": self.validacoes, "encontrados": self.encontrados}
@@ -1,12 +1,170 @@
+import os
+import shutil
+
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 
-def iniciar_driver():
+from config import CHROME_ALLOWED_URLS, CHROME_BLOCKED_URLS, CHROME_LEAN, CHROME_PROFILE_DIR
+from utils.logger import logger
+
+try:
+    import psutil
+except ImportError:  # opcional: sem ele a memória é lida do /proc (Linux)
+    psutil = None
+
+# Serviços do Chrome que não servem para a automação e só gastam memória e rede
+ARGUMENTOS_ENXUTOS = (
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-extensions",
+    "--disable-sync",
+    "--disable-client-side-phishing-detection",
+    "--disable-domain-reliability",
+    "--disable-breakpad",
+    "--disable-features=Translate,OptimizationHints,MediaRouter,InterestFeedContentSuggestions",
+    "--metrics-recording-only",
+    "--no-default-browser-check",
+    "--no-first-run",
+    "--mute-audio",
+)
+
+# Pastas de cache copiadas de um perfil já usado para "aquecer" um perfil novo
+# (os cookies ficam de fora: cada sessão faz o seu próprio login no MCard)
+PASTAS_CACHE = (os.path.join("Default", "Cache"), os.path.join("Default", "Code Cache"))
+
+
+def _padroes(lista: str) -> list:
+    return [padrao.strip() for padrao in lista.split(",") if padrao.strip()]
+
+
+def _aquecer_perfil(destino: str) -> None:
+    """Perfil novo: copia o cache de outro perfil da mesma pasta, se houver."""
+    pasta = os.path.dirname(destino)
+    for nome in sorted(os.listdir(pasta)):
+        origem = os.path.join(pasta, nome)
+        if origem == destino or not os.path.isdir(os.path.join(origem, PASTAS_CACHE[0])):
+            continue
+        for cache in PASTAS_CACHE:
+            if not os.path.isdir(os.path.join(origem, cache)):
+                continue
+            try:
+                shutil.copytree(os.path.join(origem, cache), os.path.join(destino, cache),
+                                ignore_dangling_symlinks=True, dirs_exist_ok=True)
+            except (OSError, shutil.Error) as e:
+                logger.warning(f"Cache de {origem} não copiado para {destino}: {e}")
+        logger.info(f"Perfil {destino} criado a partir do cache de {origem}.")
+        return
+
+
+def _pasta_perfil(perfil: str) -> str:
+    pasta = os.path.abspath(os.path.join(CHROME_PROFILE_DIR, perfil))
+    if not os.path.isdir(pasta):
+        os.makedirs(pasta)
+        _aquecer_perfil(pasta)
+    return pasta
+
+
+def bloquear_urls(driver, bloqueadas: list, permitidas: list) -> None:
+    """
+    Bloqueia requisições pelos padrões de URL via DevTools. Com exceções,
+    usa a forma nova do Network.setBlockedURLs (a primeira regra que casa
+    vale); num Chrome antigo, que não a conhece, as exceções são ignoradas.
+    """
+    driver.execute_cdp_cmd("Network.enable", {})
+    if permitidas:
+        regras = ([{"urlPattern": p, "block": False} for p in permitidas]
+                  + [{"urlPattern": p, "block": True} for p in bloqueadas])
+        try:
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urlPatterns": regras})
+            return
+        except Exception as e:
+            logger.warning(f"Chrome sem suporte a exceções no bloqueio de URLs ({e}); bloqueando sem elas.")
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": bloqueadas})
+
+
+def iniciar_driver(perfil: str = None):
+    """
+    Abre o Chrome. Com CHROME_LEAN=1 usa o perfil enxuto; com
+    CHROME_PROFILE_DIR e `perfil`, a sessão guarda cache e cookies numa
+    pasta própria (CHROME_PROFILE_DIR/perfil) entre um reinício e outro.
+    """
     chrome_options = Options()
     chrome_options.add_argument("--disable-blink-features=AutomationControlled")
+    if CHROME_LEAN:
+        # Devolve o controle no DOMContentLoaded, sem esperar imagens e scripts de terceiros
+        chrome_options.page_load_strategy = "eager"
+        for argumento in ARGUMENTOS_ENXUTOS:
+            chrome_options.add_argument(argumento)
+    if CHROME_PROFILE_DIR and perfil:
+        chrome_options.add_argument(f"--user-data-dir={_pasta_perfil(perfil)}")
 
     service = Service()  # usa o chromedriver do PATH
     driver = webdriver.Chrome(service=service, options=chrome_options)
 
-    return driver
\ No newline at end of file
+    bloqueadas = _padroes(CHROME_BLOCKED_URLS)
+    if CHROME_LEAN and bloqueadas:
+        try:
+            bloquear_urls(driver, bloqueadas, _padroes(CHROME_ALLOWED_URLS))
+        except Exception as e:
+            logger.error(f"Erro ao configurar o bloqueio de URLs no Chrome: {e}")
+
+    return driver
+
+
+def _filhos_proc() -> dict:
+    """pid -> pids filhos, lido do /proc."""
+    filhos = {}
+    for nome in os.listdir("/proc"):
+        if not nome.isdigit():
+            continue
+        try:
+            with open(f"/proc/{nome}/stat") as arquivo:
+                # O nome do processo (2º campo) pode ter espaços; o ppid vem logo depois do ")"
+                ppid = int(arquivo.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        filhos.setdefault(ppid, []).append(int(nome))
+    return filhos
+
+
+def _rss_proc(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/statm") as arquivo:
+            return int(arquivo.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def memoria_mb(driver):
+    """
+    Memória residente (RSS, em MB) do Chrome da sessão: o chromedriver e
+    todos os processos abaixo dele (navegador, abas, GPU). None quando não
+    dá para medir (sem psutil fora do Linux).
+    """
+    try:
+        raiz = driver.service.process.pid
+    except AttributeError:
+        return None
+    if psutil is not None:
+        try:
+            processo = psutil.Process(raiz)
+            processos = [processo] + processo.children(recursive=True)
+        except psutil.Error:
+            return None
+        total = 0
+        for p in processos:
+            try:
+                total += p.memory_info().rss
+            except psutil.Error:
+                pass
+        return round(total / 2 ** 20, 1)
+    if not os.path.isdir("/proc"):
+        return None
+    filhos, pendentes, total = _filhos_proc(), [raiz], 0
+    while pendentes:
+        pid = pendentes.pop()
+        total += _rss_proc(pid)
+        pendentes.extend(filhos.get(pid, ()))
+    return round(total / 2 ** 20, 1)
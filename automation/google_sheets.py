@@ -1,207 +1,266 @@
-import gspread
-from googleapiclient.discovery import build
-from google.oauth2.service_account import Credentials
-from datetime import datetime, timedelta
-from gspread_formatting import format_cell_range, CellFormat, NumberFormat, Color, TextFormat, Borders, Border
-from pathlib import Path
+import random
+import threading
+import time
+from datetime import datetime
+from itertools import groupby
+from utils.ledger import obter_ledger
+from utils.logger import logger
+from utils.metrics import metricas
 
 # Configurações de autenticação
 AUTHENTICATION_FILE = "credentials.json"  # seu arquivo JSON de serviço
 SPREADSHEET_NAME = "Recargas PIX e DINHEIRO - Cantina Batistério"
 
-# Autenticação com gspread
-gc = gspread.service_account(filename=AUTHENTICATION_FILE)
+# Linhas enviadas por chamada na subida em lote (evita payloads gigantes)
+TAMANHO_LOTE = 500
+# Tentativas quando a API responde 429 (cota) ou erro 5xx
+MAX_TENTATIVAS = 6
+# Nome do checkpoint da sincronização no livro de recargas
+CHECKPOINT_SHEETS = "google_sheets"
 
-# Função para obter ou criar a aba
-def get_or_create_sheet():
-    today = datetime.now().strftime("%d/%m/%Y")
-    yesterday = (datetime.now() - timedelta(days=1)).strftime("%d/%m/%Y")
-
-    sh = gc.open(SPREADSHEET_NAME)
-    worksheet = None
-
-    # Verifica se já existe aba com data de hoje ou ontem
-    for ws in sh.worksheets():
-        if ws.title in (today, yesterday):
-            worksheet = ws
-            break
-
-    # Se não existir, cria e formata
-    if worksheet is None:
-        worksheet = sh.add_worksheet(title=today, rows=1000, cols=27)
-
-        # Mesclar A1:C1 e título
-        worksheet.merge_cells(1, 1, 1, 3)  # A1:C1
-        worksheet.update_acell("A1", "RECARGAS VIA PIX")
-        format_cell_range(
-            worksheet,
-            "A1:C1",
-            CellFormat(
-                textFormat=TextFormat(bold=True),
-                horizontalAlignment="CENTER",
-                backgroundColor=Color(red=0.56, green=0.48, blue=0.76),
-            ),
-        )
-
-        # Cabeçalhos A2:C2
-        headers = [["NOME DO PAGADOR", "VALOR", "CARTÃO"]]
-        worksheet.update("A2:C2", headers)
-        format_cell_range(
-            worksheet,
-            "A2:C2",
-            CellFormat(
-                textFormat=TextFormat(bold=True),
-                horizontalAlignment="CENTER",
-            ),
-        )
-
-        format_cell_range(
-            worksheet,
-            "B3:B1000",
-            CellFormat(
-                numberFormat=NumberFormat(
-                    type="NUMBER",
-                    pattern='"R$"#,##0.00'
-                )
-            )
-        )
-
-        format_cell_range(
-            worksheet,
-            "F3:F7",
-            CellFormat(
-                numberFormat=NumberFormat(
-                    type="NUMBER",
-                    pattern='"R$"#,##0.00'
-                )
-            )
-        )
-
-        # E3:E7 labels
-        labels = [["TOTAL SISTEMA"], ["PIX"], ["DINHEIRO"], ["SANGRIA"], ["EM CAIXA"]]
-        worksheet.update("E3:E7", labels)
-
-        # Fórmula PIX → soma da coluna B (VALOR)
-        worksheet.update_acell("F4", "=SUM(B3:B1000)")
-
-        # Cores e bordas E3:F6
-        row_colors = [
-            Color(red=0.0, green=1.0, blue=0.0),   # Verde
-            Color(red=1.0, green=0.65, blue=0.0),  # Laranja
-            Color(red=0.0, green=0.0, blue=1.0),   # Azul
-            Color(red=1.0, green=0.0, blue=0.0),   # Vermelho
-            Color(red=1.0, green=1.0, blue=1.0)    # Branco
-        ]
-        for i, color in enumerate(row_colors, start=3):
-            format_cell_range(
-                worksheet,
-                f"E{i}",
-                CellFormat(
-                    backgroundColor=color,
-                    horizontalAlignment="CENTER",
-                    textFormat=TextFormat(bold=True),
-                    borders=Borders(
-                        top=Border(style="SOLID"),
-                        bottom=Border(style="SOLID"),
-                        left=Border(style="SOLID"),
-                        right=Border(style="SOLID"),
-                    ),
-                ),
-            )
-            format_cell_range(
-                worksheet,
-                f"F{i}",
-                CellFormat(
-                    horizontalAlignment="CENTER",
-                    textFormat=TextFormat(bold=True),
-                    borders=Borders(
-                        top=Border(style="SOLID"),
-                        bottom=Border(style="SOLID"),
-                        left=Border(style="SOLID"),
-                        right=Border(style="SOLID"),
-                    ),
-                ),
-            )
-
-        # Bordas A1:C2
-        format_cell_range(
-            worksheet,
-            "A1:C2",
-            CellFormat(
-                borders=Borders(
-                    top=Border(style="SOLID"),
-                    bottom=Border(style="SOLID"),
-                    left=Border(style="SOLID"),
-                    right=Border(style="SOLID"),
-                )
-            ),
-        )
-        format_cell_range(
-            worksheet,
-            "A3:C1000",
-            CellFormat(horizontalAlignment="CENTER")
-        )
-
-        creds = Credentials.from_service_account_file("credentials.json")
-
-        service = build("sheets", "v4", credentials=creds)
-        sheet_id = worksheet._properties["sheetId"]
-
-        requests = [
-            # Coluna A (índices baseados em zero: A=0)
-            {
-                "updateDimensionProperties": {
-                    "range": {
-                        "sheetId": sheet_id,
-                        "dimension": "COLUMNS",
-                        "startIndex": 0,   # A
-                        "endIndex": 1
-                    },
-                    "properties": { "pixelSize": 465 },
-                    "fields": "pixelSize"
-                }
-            },
-            # Coluna E (E = índice 4)
-            {
-                "updateDimensionProperties": {
-                    "range": {
-                        "sheetId": sheet_id,
-                        "dimension": "COLUMNS",
-                        "startIndex": 4,   # E
-                        "endIndex": 5
-                    },
-                    "properties": { "pixelSize": 255 },
-                    "fields": "pixelSize"
-                }
+# Cliente gspread autenticado na primeira chamada (não no import), para o app
+# subir rápido e poder ser importado sem credentials.json
+_gc = None
+_gc_lock = threading.Lock()
+
+def obter_cliente():
+    """Autentica com gspread na primeira chamada e reaproveita o cliente depois."""
+    global _gc
+    with _gc_lock:
+        if _gc is None:
+            import gspread
+            _gc = gspread.service_account(filename=AUTHENTICATION_FILE)
+        return _gc
+
+# Planilha e abas já encontradas/criadas, por título (evita gc.open + worksheets() a cada chamada)
+_cache_aba = {"planilha": None, "abas": {}}
+_cache_lock = threading.Lock()
+
+# ===== Modelo da aba diária =====
+BORDA_SOLIDA = {lado: {"style": "SOLID"} for lado in ("top", "bottom", "left", "right")}
+FORMATO_REAIS = {"type": "NUMBER", "pattern": '"R$"#,##0.00'}
+
+# Células mescladas
+MODELO_MESCLAS = ["A1:C1"]
+
+# Valores iniciais: (intervalo, linhas). Strings iniciadas com "=" são fórmulas.
+MODELO_VALORES = [
+    ("A1", [["RECARGAS VIA PIX"]]),
+    ("A2:C2", [["NOME DO PAGADOR", "VALOR", "CARTÃO"]]),
+    ("E3:E7", [["TOTAL SISTEMA"], ["PIX"], ["DINHEIRO"], ["SANGRIA"], ["EM CAIXA"]]),
+    # Fórmula PIX → soma da coluna B (VALOR)
+    ("F4", [["=SUM(B3:B1000)"]]),
+]
+
+# Formatos: (intervalo, userEnteredFormat). Só os campos informados são alterados.
+MODELO_FORMATOS = [
+    ("A1:C1", {"textFormat": {"bold": True}, "horizontalAlignment": "CENTER",
+               "backgroundColor": {"red": 0.56, "green": 0.48, "blue": 0.76}}),
+    ("A2:C2", {"textFormat": {"bold": True}, "horizontalAlignment": "CENTER"}),
+    ("B3:B1000", {"numberFormat": FORMATO_REAIS}),
+    ("F3:F7", {"numberFormat": FORMATO_REAIS}),
+    # Cores e bordas E3:F7 (verde, laranja, azul, vermelho, branco)
+    *[
+        (f"E{linha}", {"backgroundColor": cor, "horizontalAlignment": "CENTER",
+                       "textFormat": {"bold": True}, "borders": BORDA_SOLIDA})
+        for linha, cor in enumerate([
+            {"red": 0.0, "green": 1.0, "blue": 0.0},
+            {"red": 1.0, "green": 0.65, "blue": 0.0},
+            {"red": 0.0, "green": 0.0, "blue": 1.0},
+            {"red": 1.0, "green": 0.0, "blue": 0.0},
+            {"red": 1.0, "green": 1.0, "blue": 1.0},
+        ], start=3)
+    ],
+    ("F3:F7", {"horizontalAlignment": "CENTER", "textFormat": {"bold": True}, "borders": BORDA_SOLIDA}),
+    # Bordas A1:C2
+    ("A1:C2", {"borders": BORDA_SOLIDA}),
+    ("A3:C1000", {"horizontalAlignment": "CENTER"}),
+]
+
+# Larguras de coluna: (índice baseado em zero, pixels) → A=0, E=4
+MODELO_LARGURAS = [(0, 465), (4, 255)]
+
+def _valor_celula(valor):
+    if isinstance(valor, str) and valor.startswith("="):
+        return {"userEnteredValue": {"formulaValue": valor}}
+    if isinstance(valor, (int, float)):
+        return {"userEnteredValue": {"numberValue": valor}}
+    return {"userEnteredValue": {"stringValue": str(valor)}}
+
+def montar_requisicoes_aba(sheet_id, titulo, linhas=1000, colunas=27):
+    """
+    Gera, a partir do modelo, todas as requisições que criam e formatam a aba
+    do dia (criação, mesclas, valores, fórmulas, formatos e larguras), para
+    serem enviadas em um único batchUpdate.
+    """
+    from gspread.utils import a1_range_to_grid_range
+
+    requisicoes = [{
+        "addSheet": {
+            "properties": {
+                "sheetId": sheet_id,
+                "title": titulo,
+                "gridProperties": {"rowCount": linhas, "columnCount": colunas},
             }
-        ]
+        }
+    }]
+    for intervalo in MODELO_MESCLAS:
+        requisicoes.append({"mergeCells": {
+            "range": a1_range_to_grid_range(intervalo, sheet_id),
+            "mergeType": "MERGE_ALL",
+        }})
+    for intervalo, valores in MODELO_VALORES:
+        requisicoes.append({"updateCells": {
+            "range": a1_range_to_grid_range(intervalo, sheet_id),
+            "rows": [{"values": [_valor_celula(v) for v in linha]} for linha in valores],
+            "fields": "userEnteredValue",
+        }})
+    for intervalo, formato in MODELO_FORMATOS:
+        requisicoes.append({"repeatCell": {
+            "range": a1_range_to_grid_range(intervalo, sheet_id),
+            "cell": {"userEnteredFormat": formato},
+            "fields": "userEnteredFormat(" + ",".join(formato) + ")",
+        }})
+    for coluna, pixels in MODELO_LARGURAS:
+        requisicoes.append({"updateDimensionProperties": {
+            "range": {"sheetId": sheet_id, "dimension": "COLUMNS",
+                      "startIndex": coluna, "endIndex": coluna + 1},
+            "properties": {"pixelSize": pixels},
+            "fields": "pixelSize",
+        }})
+    return requisicoes
+
+def criar_aba(sh, titulo):
+    """Cria e formata a aba do dia com uma única chamada à API."""
+    import gspread
+
+    sheet_id = random.randint(1, 2**31 - 1)
+    resposta = _com_backoff(sh.batch_update, {"requests": montar_requisicoes_aba(sheet_id, titulo)})
+    propriedades = resposta["replies"][0]["addSheet"]["properties"]
+    return gspread.Worksheet(sh, propriedades, sh.id, sh.client)
+
+# Função para obter ou criar a aba
+def get_or_create_sheet(data=None):
+    """
+    Aba do dia `data` (AAAA-MM-DD, como no livro; padrão hoje), criada e
+    formatada se ainda não existir. Cada dia tem a sua aba: a sincronização
+    contínua nunca escreve as recargas de um dia na aba de outro.
+    """
+    dia = datetime.strptime(data, "%Y-%m-%d") if data else datetime.now()
+    titulo = dia.strftime("%d/%m/%Y")
+
+    with _cache_lock:
+        # Aba já encontrada/criada antes: reaproveita
+        if titulo in _cache_aba["abas"]:
+            return _cache_aba["abas"][titulo]
+
+        sh = _cache_aba["planilha"] or _com_backoff(obter_cliente().open, SPREADSHEET_NAME)
+        _cache_aba["planilha"] = sh
+        worksheet = None
+
+        # Verifica se já existe aba com a data
+        for ws in _com_backoff(sh.worksheets):
+            if ws.title == titulo:
+                worksheet = ws
+                break
+
+        # Se não existir, cria e formata
+        if worksheet is None:
+            worksheet = criar_aba(sh, titulo)
+
+        _cache_aba["abas"][titulo] = worksheet
+        return worksheet
+
+def limpar_cache_aba():
+    """Esquece as abas em cache (ex.: se alguém apagou a aba manualmente)."""
+    with _cache_lock:
+        _cache_aba.update(planilha=None, abas={})
 
-        service.spreadsheets().batchUpdate(
-            spreadsheetId=sh.id,
-            body={"requests": requests}
-        ).execute()
+def _com_backoff(funcao, *args, **kwargs):
+    """Executa uma chamada à API repetindo com espera exponencial em caso de 429/5xx."""
+    import gspread
 
-    return worksheet
+    chamada = getattr(funcao, "__name__", "api")
+    for tentativa in range(MAX_TENTATIVAS):
+        try:
+            with metricas.medir("sheets_api", chamada=chamada):
+                return funcao(*args, **kwargs)
+        except gspread.exceptions.APIError as e:
+            if (e.code != 429 and e.code < 500) or tentativa == MAX_TENTATIVAS - 1:
+                metricas.incrementar("sheets_erros_total", chamada=chamada, codigo=e.code)
+                raise
+            metricas.incrementar("sheets_retentativas_total", chamada=chamada, codigo=e.code)
+            espera = 2 ** tentativa + random.uniform(0, 1)
+            logger.warning(f"Google Sheets respondeu {e.code}; nova tentativa em {espera:.1f}s.")
+            time.sleep(espera)
+
+def enviar_linhas(ws, linhas):
+    """
+    Escreve todas as linhas a partir da próxima linha vazia da coluna A.
+    A próxima linha é calculada uma única vez e cada bloco de TAMANHO_LOTE
+    linhas vai em uma só chamada, então N recargas custam 1 leitura + N/TAMANHO_LOTE escritas.
+    """
+    if not linhas:
+        return 0
+    next_row = len(_com_backoff(ws.col_values, 1)) + 1
+    ultima_linha = next_row + len(linhas) - 1
+    if ultima_linha > ws.row_count:
+        _com_backoff(ws.add_rows, ultima_linha - ws.row_count)
+    for inicio in range(0, len(linhas), TAMANHO_LOTE):
+        bloco = linhas[inicio:inicio + TAMANHO_LOTE]
+        primeira = next_row + inicio
+        ultima = primeira + len(bloco) - 1
+        _com_backoff(ws.update, values=bloco, range_name=f"A{primeira}:C{ultima}")
+    logger.info(f"SHEETS: {len(linhas)} recargas PIX adicionadas na aba {ws.title} a partir da linha {next_row}.")
+    return len(linhas)
+
+def linhas_planilha(recargas):
+    """Converte registros do livro de recargas em linhas NOME/VALOR/CARTÃO."""
+    return [[r.nome.upper(), r.valor_centavos / 100, r.cartao] for r in recargas]
+
+def _enviar_na_aba(data, linhas):
+    """
+    Envia as linhas para a aba do dia. Se a aba em cache foi apagada ou
+    renomeada, ou a API recusou a chamada, esquece o cache e tenta uma vez
+    de novo com a planilha buscada do zero.
+    """
+    import gspread
+
+    try:
+        return enviar_linhas(get_or_create_sheet(data), linhas)
+    except (gspread.exceptions.APIError, gspread.exceptions.WorksheetNotFound) as e:
+        # 429 e 5xx já esgotaram as tentativas no _com_backoff
+        if isinstance(e, gspread.exceptions.APIError) and (e.code == 429 or e.code >= 500):
+            raise
+        logger.warning(f"SHEETS: Erro ao escrever na aba de {data} ({e}); buscando a planilha de novo.")
+        limpar_cache_aba()
+        return enviar_linhas(get_or_create_sheet(data), linhas)
+
+def sincronizar_pendentes(limite=TAMANHO_LOTE):
+    """
+    Envia ao Sheets as recargas PIX gravadas no livro desde o último checkpoint.
+    Cada recarga vai para a aba do seu dia (Recarga.data). O checkpoint só
+    avança depois que a escrita de cada trecho do mesmo dia foi confirmada
+    pela API, então rodar de novo nunca duplica linhas. Devolve quantos
+    registros foram lidos.
+    """
+    ledger = obter_ledger()
+    checkpoint = ledger.ler_checkpoint(CHECKPOINT_SHEETS)
+    recargas = ledger.listar(apos_id=checkpoint, limite=limite)
+    if not recargas:
+        return 0
+    for data, trecho in groupby(recargas, key=lambda r: r.data):
+        trecho = list(trecho)
+        pix = [r for r in trecho if r.forma_pagamento == "PIX"]
+        if pix:
+            _enviar_na_aba(data, linhas_planilha(pix))
+        ledger.salvar_checkpoint(CHECKPOINT_SHEETS, trecho[-1].id)
+    return len(recargas)
 
 def adicionar_recarga(metodo_pagamento):
     if metodo_pagamento.upper() == "PIX":
-        ws = get_or_create_sheet()
-        # Encontra próxima linha vazia
-        
-        with open("recargas.txt", "r", encoding="utf-8") as f:
-            for linha in f:
-                next_row = len(ws.col_values(1)) + 1
-                linha_limpa = linha.replace("\n", "")
-                nome, valor, cartao = linha_limpa.split(",")
-                ws.update(f"A{next_row}:C{next_row}", [[nome.upper(), float(valor.replace(",", ".")), cartao]])
-                print(f"Recarga PIX adicionada na linha {next_row}.")
-    else:
-        print("Pagamento em dinheiro — não será adicionado ao Google Sheets.")
-
-def adicionar_recarga_txt(nome, valor, cartao):
-    if Path("recargas.txt").exists():
-        with open("recargas.txt", "a", encoding="utf-8") as f:
-            f.write(f"{nome},{valor},{cartao}\n")
+        # Sobe tudo o que ainda não foi enviado, em blocos
+        while sincronizar_pendentes():
+            pass
     else:
-        with open("recargas.txt", "w", encoding="utf-8") as f:
-            f.write(f"{nome},{valor},{cartao}\n")
\ No newline at end of file
+        logger.info("Pagamento em dinheiro — não será adicionado ao Google Sheets.")
@@ -0,0 +1,219 @@
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+from config import HTTP_SUCCESS_MARKER
+from utils.card_index import TITULAR_DESCONHECIDO
+from utils.logger import logger
+from utils.metrics import metricas
+
+# Tempo máximo (s) de cada requisição ao MCard
+TIMEOUT_HTTP = 15
+
+# Lê da página já logada o formulário da recarga: destino, campos ocultos e
+# os nomes dos campos que a automação preenche
+SCRIPT_DESCOBRIR_FORMULARIO = """
+const campo = document.getElementById('nrcartaocredito');
+const form = campo && campo.form;
+if (!form) { return null; }
+const dados = {};
+for (const el of form.elements) {
+    if (!el.name || el.disabled || el.tagName === 'BUTTON' || el.type === 'submit') { continue; }
+    if ((el.type === 'checkbox' || el.type === 'radio') && !el.checked) { continue; }
+    dados[el.name] = el.value;
+}
+const nome = (id) => { const el = document.getElementById(id); return el ? el.name : null; };
+const validar = Array.from(form.querySelectorAll('button')).find(b => b.textContent.trim() === 'Validar');
+return {
+    action: form.action || window.location.href,
+    method: (form.getAttribute('method') || 'get').toUpperCase(),
+    dados: dados,
+    nomes: {tipoPg: nome('tipoPg'), cartao: nome('nrcartaocredito'),
+            acrescido: nome('acrescido'), pagocredito: nome('pagocredito')},
+    validar: validar && validar.name ? [validar.name, validar.value] : null,
+    userAgent: navigator.userAgent,
+};
+"""
+
+ELEMENTOS_VAZIOS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "wbr"}
+
+
+class LayoutInesperado(Exception):
+    """A resposta não tem o formato esperado; seguro cair para o Selenium (nada foi confirmado)."""
+
+
+class ConfirmacaoIncerta(Exception):
+    """A confirmação foi enviada mas a resposta não comprova o sucesso; NÃO repetir a recarga."""
+
+
+# Resultado de uma recarga com a confirmação incerta (pode ou não ter sido feita)
+MENSAGEM_CONFIRMACAO_INCERTA = "Confirmação incerta — confira no MCard antes de repetir a recarga."
+
+
+class _PaginaMCard(HTMLParser):
+    """Extrai da resposta do MCard os formulários, o botão de confirmar e o nome do titular."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.formularios = []
+        self.confirmar = None  # (índice do formulário, nome, valor)
+        self.nome_titular = None
+        self.tem_login = False
+        self._form_atual = None
+        self._select_atual = None
+        self._pilha = []
+        self._capturando_nome = False
+        self._texto_nome = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = (attrs.get("class") or "").split()
+        if tag == "form":
+            self._form_atual = len(self.formularios)
+            self.formularios.append({"action": attrs.get("action") or "",
+                                     "method": (attrs.get("method") or "get").upper(), "dados": {}})
+        elif tag in ("input", "textarea") and attrs.get("name"):
+            if attrs["name"] == "login":
+                self.tem_login = True
+            tipo = (attrs.get("type") or "text").lower()
+            marcado = tipo not in ("checkbox", "radio") or "checked" in attrs
+            if self._form_atual is not None and tipo not in ("submit", "button") and marcado:
+                self.formularios[self._form_atual]["dados"][attrs["name"]] = attrs.get("value") or ""
+        elif tag == "select" and attrs.get("name"):
+            self._select_atual = attrs["name"]
+        elif tag == "option" and self._select_atual and self._form_atual is not None:
+            dados = self.formularios[self._form_atual]["dados"]
+            if "selected" in attrs or self._select_atual not in dados:
+                dados[self._select_atual] = attrs.get("value") or ""
+        elif tag == "span" and self._pilha and self._pilha[-1][0] == "div" and "col-md-4" in self._pilha[-1][1]:
+            if self.nome_titular is None:
+                self._capturando_nome = True
+
+        if attrs.get("id") == "btn-maisCredito":
+            self.confirmar = (self._form_atual, attrs.get("name"), attrs.get("value") or "")
+        if tag not in ELEMENTOS_VAZIOS:
+            self._pilha.append((tag, classes))
+
+    def handle_endtag(self, tag):
+        if tag == "form":
+            self._form_atual = None
+        elif tag == "select":
+            self._select_atual = None
+        elif tag == "span" and self._capturando_nome:
+            self._capturando_nome = False
+            self.nome_titular = "".join(self._texto_nome).strip()
+        # Fecha até a tag correspondente (tolera HTML mal formado)
+        for i in range(len(self._pilha) - 1, -1, -1):
+            if self._pilha[i][0] == tag:
+                del self._pilha[i:]
+                break
+
+    def handle_data(self, data):
+        if self._capturando_nome:
+            self._texto_nome.append(data)
+
+
+def _analisar(html):
+    pagina = _PaginaMCard()
+    pagina.feed(html)
+    pagina.close()
+    return pagina
+
+
+class MotorHttp:
+    """
+    Faz a recarga por HTTP puro reaproveitando os cookies da sessão do
+    Selenium já logada: envia o formulário do Validar, lê na resposta o
+    formulário do botão de confirmar e o envia. Usa um requests.Session com
+    keep-alive, então cada recarga custa duas requisições em vez de dezenas
+    de comandos ao navegador.
+    """
+
+    def __init__(self, driver):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        formulario = driver.execute_script(SCRIPT_DESCOBRIR_FORMULARIO)
+        if not formulario:
+            raise LayoutInesperado("Formulário de recarga não encontrado na página.")
+        self.formulario = formulario
+        self.http = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+        self.http.mount("http://", adaptador)
+        self.http.mount("https://", adaptador)
+        self.http.headers["User-Agent"] = formulario["userAgent"]
+        for cookie in driver.get_cookies():
+            self.http.cookies.set(cookie["name"], cookie["value"],
+                                  domain=cookie.get("domain"), path=cookie.get("path", "/"))
+
+    def _enviar(self, metodo, url, dados):
+        if metodo == "POST":
+            resposta = self.http.post(url, data=dados, timeout=TIMEOUT_HTTP)
+        else:
+            resposta = self.http.get(url, params=dados, timeout=TIMEOUT_HTTP)
+        return resposta
+
+    def recarregar(self, forma_pagamento, numero_cartao, valor):
+        """Devolve (nome do titular, HTML do comprovante)."""
+        nomes = self.formulario["nomes"]
+        if not all(nomes[c] for c in ("cartao", "acrescido", "pagocredito")):
+            raise LayoutInesperado("Campos da recarga sem atributo name.")
+        dados = dict(self.formulario["dados"])
+        if forma_pagamento == "PIX":
+            if not nomes["tipoPg"]:
+                raise LayoutInesperado("Campo de forma de pagamento sem atributo name.")
+            dados[nomes["tipoPg"]] = "1"
+        dados[nomes["cartao"]] = str(numero_cartao)
+        dados[nomes["acrescido"]] = str(valor)
+        dados[nomes["pagocredito"]] = str(valor)
+        if self.formulario["validar"]:
+            dados[self.formulario["validar"][0]] = self.formulario["validar"][1]
+
+        # 1) Validar (não altera nada no MCard)
+        with metricas.medir("http_validacao"):
+            validacao = self._enviar(self.formulario["method"], self.formulario["action"], dados)
+        pagina = _analisar(validacao.text)
+        if validacao.status_code >= 400 or pagina.tem_login:
+            raise LayoutInesperado(f"Validação respondeu {validacao.status_code}"
+                                   f"{' (sessão expirada)' if pagina.tem_login else ''}.")
+        if pagina.confirmar is None or pagina.confirmar[0] is None:
+            raise LayoutInesperado("Botão de confirmar ausente ou fora de um formulário na resposta.")
+
+        indice, nome_botao, valor_botao = pagina.confirmar
+        confirmacao_form = pagina.formularios[indice]
+        dados_confirmacao = dict(confirmacao_form["dados"])
+        if nome_botao:
+            dados_confirmacao[nome_botao] = valor_botao
+        url_confirmacao = urljoin(validacao.url, confirmacao_form["action"] or validacao.url)
+
+        # 2) Confirmar: daqui em diante a recarga pode ter acontecido
+        try:
+            with metricas.medir("http_confirmacao"):
+                confirmacao = self._enviar(confirmacao_form["method"], url_confirmacao, dados_confirmacao)
+        except Exception as e:
+            raise ConfirmacaoIncerta(f"Erro de rede ao confirmar: {e}")
+        if confirmacao.status_code >= 400 or HTTP_SUCCESS_MARKER not in confirmacao.text:
+            raise ConfirmacaoIncerta(f"Resposta da confirmação não reconhecida (HTTP {confirmacao.status_code}).")
+        return pagina.nome_titular or "", confirmacao.text
+
+
+def recarga_http(sessao, forma_pagamento, numero_cartao, valor):
+    """
+    Tenta a recarga pelo caminho HTTP. Devolve (titular, html_comprovante) em
+    caso de sucesso ou None se for seguro cair para o Selenium. Levanta
+    ConfirmacaoIncerta se a confirmação saiu mas não foi comprovada (a
+    recarga não deve ser repetida nem contar contra a sessão).
+    """
+    try:
+        if sessao.motor_http is None:
+            sessao.motor_http = MotorHttp(sessao.driver)
+        nome, html = sessao.motor_http.recarregar(forma_pagamento, numero_cartao, valor)
+        logger.info(f"Recarga (HTTP) concluída para {nome or TITULAR_DESCONHECIDO}")
+        return nome or TITULAR_DESCONHECIDO, html
+    except ConfirmacaoIncerta as e:
+        logger.error(f"Recarga (HTTP) sem confirmação: {e} Confira no MCard antes de repetir.")
+        raise
+    except Exception as e:
+        # Cookies/formulário podem ter mudado (ex.: novo login): redescobre na próxima
+        sessao.motor_http = None
+        logger.info(f"Caminho HTTP indisponível ({e}); usando o Selenium.")
+        return None
@@ -0,0 +1,244 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+from config import POOL_SIZE, PRINT_MODE
+from utils.logger import logger
+from utils.metrics import metricas
+
+# Após esse número de falhas seguidas do navegador a sessão é considerada doente e o Chrome é recriado
+MAX_FALHAS_SEGUIDAS = 3
+# Espera (s) entre as tentativas de recriar uma sessão que não subiu; dobra a cada falha até o máximo
+RECRIAR_ESPERA_INICIAL = 5
+RECRIAR_ESPERA_MAXIMA = 300
+
+
+class PoolEsgotado(Exception):
+    """Nenhuma sessão do Chrome ficou livre dentro do tempo de espera."""
+
+
+class Sessao:
+    """Uma instância do Chrome já logada no MCard, com seu estado de saúde."""
+
+    def __init__(self, indice: int, driver):
+        self.indice = indice
+        self.driver = driver
+        self.saudavel = driver is not None
+        self.em_uso = False
+        self.falhas_seguidas = 0
+        self.total_recargas = 0
+        self.criada_em = time.time()
+        self.ultimo_uso = None
+        # Métricas da sessão do MCard (login/keep-alive)
+        self.logada_em = self.criada_em
+        self.relogins = 0
+        self.ultimo_keepalive = None
+        # Motor HTTP (automation.http_engine) com os cookies desta sessão, criado sob demanda
+        self.motor_http = None
+
+    def registrar_sucesso(self):
+        self.falhas_seguidas = 0
+        self.total_recargas += 1
+
+    def registrar_falha(self):
+        """Falha do navegador (travou, página quebrada); recusas do MCard não contam."""
+        self.falhas_seguidas += 1
+        if self.falhas_seguidas >= MAX_FALHAS_SEGUIDAS:
+            self.saudavel = False
+
+    def estado(self) -> dict:
+        return {
+            "indice": self.indice,
+            "saudavel": self.saudavel,
+            "em_uso": self.em_uso,
+            "falhas_seguidas": self.falhas_seguidas,
+            "total_recargas": self.total_recargas,
+            "idade_segundos": round(time.time() - self.criada_em, 1),
+            "idade_login_segundos": round(time.time() - self.logada_em, 1),
+            "relogins": self.relogins,
+            "ultimo_keepalive": self.ultimo_keepalive,
+            "memoria_mb": self.memoria_mb(),
+        }
+
+    def memoria_mb(self):
+        """RSS do Chrome desta sessão (MB) ou None."""
+        if self.driver is None:
+            return None
+        from automation.driver import memoria_mb
+        return memoria_mb(self.driver)
+
+
+class DriverPool:
+    """
+    Mantém N sessões do Chrome logadas no MCard. Cada recarga faz checkout de
+    uma sessão exclusiva e a devolve ao final (checkin), então duas recargas
+    nunca dividem a mesma aba. Uma sessão que não sobe ou fica doente é
+    recriada em segundo plano, com espera crescente entre as tentativas.
+    """
+
+    def __init__(self, tamanho: int = POOL_SIZE, fabrica=None, perfil: str = "sessao"):
+        self.tamanho = max(1, tamanho)
+        # Prefixo do perfil persistente de cada sessão (CHROME_PROFILE_DIR/<perfil>-<índice>)
+        self.perfil = perfil
+        # A fábrica recebe o índice e devolve um driver pronto (ou None se falhar)
+        self._fabrica = fabrica or self._criar_driver
+        self._sessoes = []
+        self._livres = []
+        self._cond = threading.Condition()
+        self.iniciando = False
+        self.iniciado = False
+        self._encerrado = threading.Event()
+
+    def _criar_driver(self, indice: int):
+        # Importa o Selenium só quando o primeiro Chrome é criado
+        from automation.driver import iniciar_driver
+        from automation.actions import login, set_margins, preparar_impressao_cdp
+
+        driver = iniciar_driver(perfil=f"{self.perfil}-{indice}")
+        if PRINT_MODE == "cdp":
+            # As margens vão direto no Page.printToPDF; só falta interceptar o window.print
+            try:
+                preparar_impressao_cdp(driver)
+            except Exception as e:
+                logger.error(f"SESSÃO {indice}: Erro ao preparar a impressão via DevTools: {e}")
+        else:
+            try:
+                set_margins(driver)
+            except Exception as e:
+                logger.error(f"SESSÃO {indice}: Erro ao configurar margens: {e}")
+        if not login(driver):
+            logger.error(f"SESSÃO {indice}: NÃO FOI POSSÍVEL FAZER LOGIN.")
+            driver.quit()
+            return None
+        return driver
+
+    def iniciar(self) -> int:
+        """
+        Cria todas as sessões em paralelo e devolve quantas ficaram saudáveis.
+        Cada sessão entra no pool assim que faz login, sem esperar as outras.
+        """
+        self.iniciando = True
+        with ThreadPoolExecutor(max_workers=self.tamanho, thread_name_prefix="pool-boot") as executor:
+            futuros = [executor.submit(self._nova_sessao, indice) for indice in range(self.tamanho)]
+            for futuro in as_completed(futuros):
+                sessao = futuro.result()
+                with self._cond:
+                    self._sessoes.append(sessao)
+                    if sessao.saudavel:
+                        self._livres.append(sessao)
+                        self._cond.notify()
+                if not sessao.saudavel:
+                    self._agendar_recriacao(sessao)
+        self.iniciando = False
+        self.iniciado = True
+        saudaveis = sum(1 for s in self._sessoes if s.saudavel)
+        logger.info(f"Pool de navegadores pronto: {saudaveis}/{self.tamanho} sessões saudáveis.")
+        return saudaveis
+
+    def _nova_sessao(self, indice: int) -> Sessao:
+        try:
+            driver = self._fabrica(indice)
+        except Exception as e:
+            logger.error(f"SESSÃO {indice}: Erro ao iniciar o navegador: {e}")
+            driver = None
+        return Sessao(indice, driver)
+
+    def checkout(self, timeout: float = None) -> Sessao:
+        """Reserva uma sessão livre, esperando até `timeout` segundos."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._livres, timeout=timeout):
+                raise PoolEsgotado("Nenhuma sessão do navegador disponível.")
+            sessao = self._livres.pop()
+            sessao.em_uso = True
+            sessao.ultimo_uso = time.time()
+            return sessao
+
+    def checkout_ociosas(self, ociosa_ha: float) -> list:
+        """Reserva, sem esperar, todas as sessões livres paradas há pelo menos `ociosa_ha` segundos."""
+        agora = time.time()
+        with self._cond:
+            ociosas = [
+                s for s in self._livres
+                if agora - max(s.ultimo_uso or s.criada_em, s.ultimo_keepalive or 0) >= ociosa_ha
+            ]
+            for sessao in ociosas:
+                self._livres.remove(sessao)
+                sessao.em_uso = True
+            return ociosas
+
+    def checkin(self, sessao: Sessao) -> None:
+        """Devolve a sessão ao pool; se ela ficou doente, o Chrome é recriado em segundo plano."""
+        with self._cond:
+            sessao.em_uso = False
+            if sessao.saudavel:
+                self._livres.append(sessao)
+                self._cond.notify()
+                return
+        self._agendar_recriacao(sessao)
+
+    def _agendar_recriacao(self, sessao: Sessao) -> None:
+        threading.Thread(target=self._recriar, args=(sessao,), name=f"pool-recriar-{sessao.indice}",
+                         daemon=True).start()
+
+    def _recriar(self, sessao: Sessao) -> None:
+        """Troca a sessão doente por um Chrome novo, tentando de novo até conseguir ou o pool encerrar."""
+        espera = RECRIAR_ESPERA_INICIAL
+        while True:
+            logger.info(f"SESSÃO {sessao.indice}: Recriando navegador.")
+            if sessao.driver is not None:
+                try:
+                    sessao.driver.quit()
+                except Exception:
+                    pass
+            nova = self._nova_sessao(sessao.indice)
+            with self._cond:
+                if self._encerrado.is_set():
+                    descartada = nova.driver
+                else:
+                    descartada = None
+                    self._sessoes[self._sessoes.index(sessao)] = nova
+                    if nova.saudavel:
+                        self._livres.append(nova)
+                        self._cond.notify()
+            if descartada is not None:
+                try:
+                    descartada.quit()
+                except Exception:
+                    pass
+            if nova.saudavel or self._encerrado.is_set():
+                return
+            sessao = nova
+            logger.error(f"SESSÃO {sessao.indice}: Navegador não subiu; nova tentativa em {espera}s.")
+            metricas.incrementar("sessao_recriacao_falhas_total")
+            if self._encerrado.wait(espera):
+                return
+            espera = min(espera * 2, RECRIAR_ESPERA_MAXIMA)
+
+    @contextmanager
+    def sessao(self, timeout: float = None):
+        sessao = self.checkout(timeout)
+        try:
+            yield sessao
+        finally:
+            self.checkin(sessao)
+
+    def prontas(self) -> int:
+        """Quantas sessões saudáveis já existem (livres ou em uso)."""
+        with self._cond:
+            return sum(1 for s in self._sessoes if s.saudavel)
+
+    def estado(self) -> list:
+        with self._cond:
+            return [s.estado() for s in self._sessoes]
+
+    def encerrar(self) -> None:
+        with self._cond:
+            self._encerrado.set()
+            sessoes, self._sessoes, self._livres = self._sessoes, [], []
+        for sessao in sessoes:
+            if sessao.driver is not None:
+                try:
+                    sessao.driver.quit()
+                except Exception:
+                    pass
@@ -0,0 +1,120 @@
+from automation.http_engine import ConfirmacaoIncerta, MENSAGEM_CONFIRMACAO_INCERTA, recarga_http
+from automation.pool import PoolEsgotado
+from automation.session_manager import garantir_login
+from config import PRINT_MODE, RECHARGE_ENGINE
+from utils.logger import logger
+from utils.metrics import metricas
+
+# Motor da recarga: "http" só funciona com a impressão via DevTools, que
+# imprime o comprovante recebido por HTTP sem depender da aba do MCard
+if RECHARGE_ENGINE == "http" and PRINT_MODE != "cdp":
+    logger.warning("RECHARGE_ENGINE=http exige PRINT_MODE=cdp; usando o Selenium.")
+    RECHARGE_ENGINE = "selenium"
+
+# Tempo máximo (s) que uma recarga espera por uma sessão livre do navegador
+POOL_CHECKOUT_TIMEOUT = 120
+
+
+def executar_recarga(task_id: str, pool_instance, form_data: dict) -> dict:
+    """
+    Parte da recarga que depende do navegador: reserva uma sessão exclusiva
+    do pool, faz a recarga e imprime o comprovante. Não grava nada: devolve
+    {'status', 'message', 'titular'} para quem a chamou (o app ou um
+    worker.py) registrar o resultado no livro e na tarefa.
+    """
+    logger.info(f"Iniciando tarefa de recarga em background: {task_id}")
+    try:
+        with metricas.medir("sessao_checkout"):
+            sessao = pool_instance.checkout(timeout=POOL_CHECKOUT_TIMEOUT)
+        try:
+            logger.info(f"TASK {task_id}: Usando a sessão {sessao.indice} do navegador.")
+            with metricas.medir("recarga_total", forma_pagamento=form_data.get('forma_pagamento')):
+                return _executar_recarga(task_id, sessao, form_data)
+        finally:
+            pool_instance.checkin(sessao)
+    except PoolEsgotado as e:
+        logger.error(f"TASK {task_id}: {e}")
+        return _resultado('failed', "Nenhum navegador disponível no momento. Tente novamente.")
+    except Exception as e:
+        logger.error(f"TASK {task_id}: Erro inesperado na automação: {e}")
+        return _resultado('failed', f"Erro crítico durante a automação: {e}")
+
+
+def _resultado(status: str, message: str, titular: str = None) -> dict:
+    return {'status': status, 'message': message, 'titular': titular}
+
+
+def _executar_recarga(task_id: str, sessao, form_data: dict) -> dict:
+    """
+    Executa a recarga na sessão reservada e registra sucesso/falha na saúde
+    da sessão. Só conta como falha da sessão o que é do navegador: uma
+    recarga recusada pelo MCard com a aba em ordem não leva à recriação.
+    """
+    from automation.actions import fazer_recarga, imprimir, imprimir_html, recarregar_formulario
+
+    driver_instance = sessao.driver
+    try:
+        # Extrai os dados do dicionário
+        forma_pagamento = form_data.get('forma_pagamento')
+        nome_pagador = form_data.get('nome_pagador')
+        numero_cartao = form_data.get('numero_cartao')
+        valor = form_data.get('valor')
+
+        # Sessão do MCard caiu enquanto a aba estava parada? Reloga antes de tentar.
+        garantir_login(sessao)
+
+        # Resultado: nome do titular do cartão (sucesso), False (falha) ou None (ainda não tentou).
+        # Caminho HTTP (opcional): None quando é seguro seguir pelo Selenium
+        titular, comprovante_html = None, None
+        if RECHARGE_ENGINE == "http":
+            try:
+                resultado_http = recarga_http(sessao, forma_pagamento, numero_cartao, valor)
+            except ConfirmacaoIncerta:
+                # Pode ter sido feita: não repete pelo Selenium e a sessão não tem culpa
+                metricas.incrementar("recargas_total", forma_pagamento=forma_pagamento, motor="http",
+                                     resultado="incerta")
+                return _resultado('failed', MENSAGEM_CONFIRMACAO_INCERTA)
+            if resultado_http is not None:
+                titular, comprovante_html = resultado_http
+                motor = "http"
+            else:
+                metricas.incrementar("recarga_fallback_total", de="http", para="selenium")
+
+        if titular is None:
+            motor = "selenium"
+            titular = fazer_recarga(driver_instance, forma_pagamento, numero_cartao, valor, nome_pagador)
+            if not titular and garantir_login(sessao):
+                # Falhou porque a sessão expirou no meio: reloga e tenta uma única vez de novo
+                logger.info(f"TASK {task_id}: Sessão expirada durante a recarga; tentando novamente após o login.")
+                metricas.incrementar("recarga_retentativas_total", forma_pagamento=forma_pagamento, motivo="sessao_expirada")
+                titular = fazer_recarga(driver_instance, forma_pagamento, numero_cartao, valor, nome_pagador)
+
+        metricas.incrementar("recargas_total", forma_pagamento=forma_pagamento, motor=motor,
+                             resultado="sucesso" if titular else "falha")
+
+        if not titular:
+            # Um Validar que não respondeu a tempo ainda pode trazer o botão de confirmar desta
+            # recarga: a aba volta ao formulário limpo antes de atender outra. Se nem isso
+            # funciona, o problema é do navegador (ou do MCard), não do cartão.
+            with metricas.medir("recarga_recarregar_formulario"):
+                if not recarregar_formulario(driver_instance):
+                    sessao.registrar_falha()
+            return _resultado('failed', "Falha ao processar recarga. O site pode ter retornado um erro.")
+
+        sessao.registrar_sucesso()
+        # Tenta imprimir, mas não falha a tarefa inteira se isso der erro.
+        try:
+            with metricas.medir("impressao", modo=PRINT_MODE):
+                if comprovante_html:
+                    imprimir_html(driver_instance, comprovante_html)
+                else:
+                    imprimir(driver_instance)
+        except Exception as e:
+            logger.error(f"TASK {task_id}: Erro ao imprimir comprovante: {e}")
+
+        return _resultado('completed', f"Recarga de R${valor} para o cartão {numero_cartao} concluída com sucesso!",
+                          titular)
+
+    except Exception:
+        sessao.registrar_falha()
+        raise
@@ -0,0 +1,103 @@
+import threading
+import time
+
+from config import KEEPALIVE_INTERVAL
+from utils.logger import logger
+
+
+def relogar(sessao) -> bool:
+    """Refaz o login do MCard na sessão e atualiza as métricas dela."""
+    from automation.actions import login
+
+    logger.info(f"SESSÃO {sessao.indice}: Sessão do MCard expirada após "
+                f"{time.time() - sessao.logada_em:.0f}s; refazendo login.")
+    if login(sessao.driver):
+        sessao.relogins += 1
+        sessao.logada_em = time.time()
+        # Cookies novos: o motor HTTP precisa ser recriado
+        sessao.motor_http = None
+        return True
+    logger.error(f"SESSÃO {sessao.indice}: Não foi possível refazer o login.")
+    sessao.saudavel = False
+    return False
+
+
+def garantir_login(sessao) -> bool:
+    """
+    Verifica (uma chamada rápida ao navegador) se a sessão ainda está logada
+    e refaz o login se caiu. Devolve True se foi preciso relogar.
+    """
+    from automation.actions import sessao_expirada
+
+    try:
+        expirada = sessao_expirada(sessao.driver)
+    except Exception as e:
+        # Navegador não responde: o pool recria o Chrome no checkin
+        logger.error(f"SESSÃO {sessao.indice}: Navegador não respondeu: {e}")
+        sessao.saudavel = False
+        return False
+    return expirada and relogar(sessao)
+
+
+class SessionKeeper:
+    """
+    Mantém vivas as sessões ociosas do pool: a cada KEEPALIVE_INTERVAL faz um
+    ping barato em cada sessão parada e relogga as que caíram, antes que uma
+    recarga descubra isso esperando 15 segundos por um campo que não existe.
+    """
+
+    def __init__(self, pool, intervalo: float = KEEPALIVE_INTERVAL):
+        self.pool = pool
+        self.intervalo = intervalo
+        self.pings = 0
+        self.pings_falhos = 0
+        self.expiradas = 0
+        self._thread = None
+
+    def iniciar(self) -> None:
+        if self.intervalo <= 0:
+            return
+        self._thread = threading.Thread(target=self._loop, name="session-keeper", daemon=True)
+        self._thread.start()
+
+    def _loop(self) -> None:
+        while True:
+            time.sleep(self.intervalo)
+            try:
+                ociosas = self.pool.checkout_ociosas(self.intervalo)
+            except Exception as e:
+                logger.error(f"KEEP-ALIVE: Erro ao reservar as sessões ociosas: {e}")
+                continue
+            for sessao in ociosas:
+                try:
+                    self._pingar(sessao)
+                except Exception as e:
+                    logger.error(f"SESSÃO {sessao.indice}: Erro no keep-alive: {e}")
+                    self.pings_falhos += 1
+                finally:
+                    self.pool.checkin(sessao)
+
+    def _pingar(self, sessao) -> None:
+        from automation.actions import manter_sessao
+
+        try:
+            ping = manter_sessao(sessao.driver)
+        except Exception as e:
+            logger.error(f"SESSÃO {sessao.indice}: Keep-alive falhou: {e}")
+            self.pings_falhos += 1
+            sessao.saudavel = False
+            return
+        self.pings += 1
+        sessao.ultimo_keepalive = time.time()
+        if ping['status'] == 0 or ping['status'] >= 400:
+            self.pings_falhos += 1
+        # O servidor já derrubou o login, mesmo que a aba ainda mostre o formulário
+        if ping['redirecionada'] or ping['login'] or ping['status'] in (401, 403):
+            self.expiradas += 1
+            relogar(sessao)
+        else:
+            garantir_login(sessao)
+
+    def estado(self) -> dict:
+        return {"intervalo": self.intervalo, "pings": self.pings, "pings_falhos": self.pings_falhos,
+                "expiradas": self.expiradas}
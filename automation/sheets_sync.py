@@ -0,0 +1,78 @@
+import random
+import threading
+import time
+
+from automation.google_sheets import sincronizar_pendentes, TAMANHO_LOTE
+from utils.logger import logger
+
+# Depois do primeiro aviso, espera até esse tempo (s) juntando recargas num micro-lote
+JANELA_MICROLOTE = 2.0
+# ...ou dispara antes se esse número de recargas chegar
+TAMANHO_MICROLOTE = 50
+# Mesmo sem avisos, confere o livro de tempos em tempos (recargas de antes de reiniciar)
+INTERVALO_VERIFICACAO = 60.0
+# Espera máxima (s) entre tentativas quando o Google está falhando
+ESPERA_MAXIMA = 300.0
+
+
+class SheetsSync:
+    """
+    Sincroniza em segundo plano o livro de recargas com o Google Sheets.
+
+    O worker da recarga só chama `notificar()` (instantâneo); esta thread junta
+    as recargas em micro-lotes e as envia a partir do checkpoint salvo no
+    livro, com espera exponencial e jitter quando a API falha.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._avisos = 0
+        self._falhas_seguidas = 0
+        self._thread = None
+        self.ultimo_envio = None
+        self.ultimo_erro = None
+
+    def iniciar(self) -> None:
+        self._thread = threading.Thread(target=self._loop, name="sheets-sync", daemon=True)
+        self._thread.start()
+
+    def notificar(self) -> None:
+        """Avisa que há uma recarga nova no livro."""
+        with self._cond:
+            self._avisos += 1
+            self._cond.notify()
+
+    def _aguardar_microlote(self) -> None:
+        with self._cond:
+            # Dorme até o primeiro aviso (ou até a verificação periódica)
+            self._cond.wait_for(lambda: self._avisos, timeout=INTERVALO_VERIFICACAO)
+            if self._avisos:
+                # Gatilho de tempo ou de tamanho, o que vier primeiro
+                self._cond.wait_for(lambda: self._avisos >= TAMANHO_MICROLOTE, timeout=JANELA_MICROLOTE)
+            self._avisos = 0
+
+    def _loop(self) -> None:
+        while True:
+            self._aguardar_microlote()
+            try:
+                while sincronizar_pendentes(TAMANHO_LOTE):
+                    pass
+                self._falhas_seguidas = 0
+                self.ultimo_envio = time.time()
+            except Exception as e:
+                self._falhas_seguidas += 1
+                self.ultimo_erro = str(e)
+                espera = min(ESPERA_MAXIMA, 2 ** self._falhas_seguidas)
+                espera = random.uniform(espera / 2, espera)
+                logger.error(f"SHEETS SYNC: Falha ao sincronizar ({e}); nova tentativa em {espera:.0f}s.")
+                time.sleep(espera)
+                # Garante nova tentativa mesmo sem recargas novas
+                self.notificar()
+
+    def estado(self) -> dict:
+        return {
+            "ativo": bool(self._thread and self._thread.is_alive()),
+            "falhas_seguidas": self._falhas_seguidas,
+            "ultimo_envio": self.ultimo_envio,
+            "ultimo_erro": self.ultimo_erro,
+        }
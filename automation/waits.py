@@ -0,0 +1,228 @@
+import threading
+import time
+from collections import deque
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from config import WAIT_ADAPTIVE, WAIT_MAX_TIMEOUT, WAIT_MIN_TIMEOUT
+from utils.logger import logger
+from utils.metrics import metricas
+
+# Janela de amostras recentes por seletor (o p99 acompanha mudanças no MCard)
+AMOSTRAS_SELETOR = 200
+# Abaixo disso o seletor ainda não tem histórico: usa WAIT_MAX_TIMEOUT
+MIN_AMOSTRAS = 20
+# Tempo limite = p99 × FATOR_P99 + MARGEM_ESPERA, entre WAIT_MIN_TIMEOUT e WAIT_MAX_TIMEOUT
+FATOR_P99 = 1.5
+MARGEM_ESPERA = 0.5
+
+# Localizador de um elemento dentro de shadow roots: seletores CSS separados por " >>> "
+SOMBRA = "sombra"
+
+# Espera até um dos localizadores ([modo, valor]) achar um elemento e devolve
+# [índice, elemento], ou null no tempo limite. O MutationObserver responde na
+# mutação que cria o elemento, sem intervalo de polling; dentro de shadow
+# roots (que ele não enxerga) a busca se repete a cada quadro.
+# Argumentos: localizadores, timeout (ms).
+SCRIPT_ESPERA = """
+const [localizadores, timeoutMs, done] = arguments;
+const porXPath = (xp) => document.evaluate(xp, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+const naSombra = (caminho) => {
+    const partes = caminho.split(' >>> ');
+    let raiz = document;
+    for (let i = 0; i < partes.length - 1; i++) {
+        const host = raiz.querySelector(partes[i]);
+        if (!host || !host.shadowRoot) { return null; }
+        raiz = host.shadowRoot;
+    }
+    return raiz.querySelector(partes[partes.length - 1]);
+};
+const achar = ([modo, valor]) => {
+    switch (modo) {
+        case 'id': return document.getElementById(valor);
+        case 'name': return document.getElementsByName(valor)[0];
+        case 'tag name': return document.getElementsByTagName(valor)[0];
+        case 'class name': return document.getElementsByClassName(valor)[0];
+        case 'xpath': return porXPath(valor);
+        case 'sombra': return naSombra(valor);
+        default: return document.querySelector(valor);
+    }
+};
+const procurar = () => {
+    for (let i = 0; i < localizadores.length; i++) {
+        const elemento = achar(localizadores[i]);
+        if (elemento) { return [i, elemento]; }
+    }
+    return null;
+};
+const encontrado = procurar();
+if (encontrado) { return done(encontrado); }
+let terminou = false;
+const terminar = (resultado) => {
+    if (terminou) { return; }
+    terminou = true;
+    observer.disconnect();
+    clearTimeout(limite);
+    done(resultado);
+};
+const observer = new MutationObserver(() => {
+    const resultado = procurar();
+    if (resultado) { terminar(resultado); }
+});
+const limite = setTimeout(() => terminar(null), timeoutMs);
+observer.observe(document.documentElement, {childList: true, subtree: true, attributes: true});
+if (localizadores.some(([modo]) => modo === 'sombra')) {
+    const quadro = () => {
+        if (terminou) { return; }
+        const resultado = procurar();
+        if (resultado) { terminar(resultado); } else { setTimeout(quadro, 16); }
+    };
+    setTimeout(quadro, 16);
+}
+"""
+
+# Erros do WebDriver quando a página navega no meio da espera (ex.: o Enter do login)
+ERROS_NAVEGACAO = ("unloaded", "detached", "context was destroyed", "navigat")
+
+
+def chave(localizador) -> str:
+    modo, valor = localizador
+    return f"{modo}={valor}"
+
+
+class PerfilEsperas:
+    """
+    Histórico de latência de cada seletor: quanto tempo o elemento levou
+    para aparecer nas últimas esperas e quantas vezes não apareceu. O tempo
+    limite de cada espera sai do p99 observado, então um elemento que nunca
+    vem falha em ~1 s em vez de 15, enquanto um passo lento mas saudável
+    continua com folga. A espera seguinte a uma falha usa o limite máximo:
+    se o MCard só ficou mais lento que o histórico, a amostra lenta entra no
+    p99; se falhar de novo, o elemento realmente não vem e o seletor volta
+    ao limite aprendido. Um seletor com piso (`definir_piso`) nunca espera
+    menos que ele, mesmo com histórico rápido.
+    """
+
+    def __init__(self, adaptativo: bool = WAIT_ADAPTIVE, minimo: float = WAIT_MIN_TIMEOUT,
+                 maximo: float = WAIT_MAX_TIMEOUT):
+        self.adaptativo = adaptativo
+        self.minimo = minimo
+        self.maximo = maximo
+        self._lock = threading.Lock()
+        self._amostras = {}  # chave -> deque de segundos
+        self._falhas = {}  # chave -> total de esperas que estouraram o tempo
+        self._falhas_seguidas = {}
+        self._pisos = {}  # chave -> menor tempo limite (s) daquele seletor
+
+    def definir_piso(self, chave: str, segundos: float) -> None:
+        with self._lock:
+            self._pisos[chave] = segundos
+
+    @staticmethod
+    def _percentil(ordenadas: list, p: float) -> float:
+        return ordenadas[min(len(ordenadas) - 1, int(p / 100 * len(ordenadas)))]
+
+    def tempo_limite(self, chave: str) -> float:
+        with self._lock:
+            amostras = self._amostras.get(chave)
+            piso = self._pisos.get(chave, self.minimo)
+            if (not self.adaptativo or self._falhas_seguidas.get(chave) == 1
+                    or not amostras or len(amostras) < MIN_AMOSTRAS):
+                return max(self.maximo, piso)
+            p99 = self._percentil(sorted(amostras), 99)
+        return max(piso, min(self.maximo, max(self.minimo, p99 * FATOR_P99 + MARGEM_ESPERA)))
+
+    def registrar_sucesso(self, chave: str, segundos: float) -> None:
+        with self._lock:
+            self._amostras.setdefault(chave, deque(maxlen=AMOSTRAS_SELETOR)).append(segundos)
+            self._falhas_seguidas[chave] = 0
+        metricas.observar("espera_elemento", segundos, seletor=chave)
+
+    def registrar_falha(self, chave: str) -> None:
+        with self._lock:
+            self._falhas[chave] = self._falhas.get(chave, 0) + 1
+            self._falhas_seguidas[chave] = self._falhas_seguidas.get(chave, 0) + 1
+        metricas.incrementar("espera_elemento_falhas_total", seletor=chave)
+
+    def estado(self) -> dict:
+        """Por seletor: amostras, p50/p95/p99, máximo, falhas e o tempo limite atual (s)."""
+        with self._lock:
+            chaves = sorted(set(self._amostras) | set(self._falhas))
+            copias = {c: sorted(self._amostras.get(c, ())) for c in chaves}
+            falhas = dict(self._falhas)
+        estado = {}
+        for c, ordenadas in copias.items():
+            estado[c] = {
+                "amostras": len(ordenadas),
+                "p50_s": round(self._percentil(ordenadas, 50), 3) if ordenadas else None,
+                "p95_s": round(self._percentil(ordenadas, 95), 3) if ordenadas else None,
+                "p99_s": round(self._percentil(ordenadas, 99), 3) if ordenadas else None,
+                "max_s": round(ordenadas[-1], 3) if ordenadas else None,
+                "falhas": falhas.get(c, 0),
+                "tempo_limite_s": round(self.tempo_limite(c), 3),
+            }
+        return estado
+
+
+perfil_esperas = PerfilEsperas()
+
+
+def esperar_um_de(driver, localizadores: list, timeout: float = None, nome: str = None):
+    """
+    Espera o primeiro dos localizadores ((By.ID, 'x'), (SOMBRA, 'a >>> b')...)
+    achar um elemento e devolve (índice, elemento). Sem `timeout`, usa o
+    tempo limite aprendido para o seletor. Levanta TimeoutException.
+    """
+    nome = nome or " | ".join(chave(localizador) for localizador in localizadores)
+    limite = timeout if timeout is not None else perfil_esperas.tempo_limite(nome)
+    inicio = time.monotonic()
+    fim = inicio + limite
+    while True:
+        restante = fim - time.monotonic()
+        if restante <= 0:
+            break
+        driver.set_script_timeout(restante + 5)
+        try:
+            resultado = driver.execute_async_script(
+                SCRIPT_ESPERA, [list(localizador) for localizador in localizadores], int(restante * 1000)
+            )
+        except TimeoutException:
+            break
+        except WebDriverException as e:
+            if not any(erro in str(e).lower() for erro in ERROS_NAVEGACAO):
+                raise
+            # A página trocou no meio da espera: continua esperando no documento novo
+            logger.debug(f"Página recarregada durante a espera por {nome}; esperando de novo.")
+            continue
+        if resultado:
+            perfil_esperas.registrar_sucesso(nome, time.monotonic() - inicio)
+            return resultado[0], resultado[1]
+        break
+    perfil_esperas.registrar_falha(nome)
+    raise TimeoutException(f"{nome} não apareceu em {limite:.1f}s.")
+
+
+def esperar(driver, localizador, timeout: float = None):
+    """Espera o elemento aparecer e o devolve (TimeoutException se não vier no tempo limite)."""
+    return esperar_um_de(driver, [localizador], timeout)[1]
+
+
+def esperar_janelas(driver, quantidade: int, timeout: float = None, nome: str = "janelas") -> list:
+    """
+    Espera o navegador ter pelo menos `quantidade` janelas/abas e devolve os
+    handles. Janelas não geram mutações no DOM, então aqui a consulta se
+    repete, começando em 10 ms e dobrando até 100 ms.
+    """
+    limite = timeout if timeout is not None else perfil_esperas.tempo_limite(nome)
+    inicio = time.monotonic()
+    intervalo = 0.01
+    while True:
+        janelas = driver.window_handles
+        if len(janelas) >= quantidade:
+            perfil_esperas.registrar_sucesso(nome, time.monotonic() - inicio)
+            return janelas
+        if time.monotonic() - inicio >= limite:
+            perfil_esperas.registrar_falha(nome)
+            raise TimeoutException(f"A janela {quantidade} não abriu em {limite:.1f}s.")
+        time.sleep(intervalo)
+        intervalo = min(intervalo * 2, 0.1)
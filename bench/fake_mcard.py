@@ -0,0 +1,182 @@
+"""
+Imitação local do MCard para os benchmarks: login, link "manip2", formulário
+da recarga (tipoPg/nrcartaocredito/acrescido/pagocredito/Validar), resposta
+do Validar com o titular e o botão btn-maisCredito, e a página do comprovante
+que chama window.print(). Cada resposta pode ter uma latência artificial para
+simular o servidor remoto.
+
+Uso isolado:  python -m bench.fake_mcard --porta 5100 --latencia 0.15
+"""
+import argparse
+import threading
+import time
+from collections import Counter
+
+from flask import Flask, request, session, redirect, url_for
+
+# Cartões que começam com este prefixo não existem (o Validar devolve erro)
+PREFIXO_CARTAO_INVALIDO = "0000"
+
+PAGINA = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>MCard (bench)</title></head>
+<body>{corpo}</body></html>"""
+
+LOGIN = """
+<form method="post" action="/login">
+    <input type="text" name="login" autofocus>
+    <input type="password" name="senha">
+    <button type="submit">Entrar</button>
+</form>"""
+
+INICIO = """<p>Bem-vindo</p><a id="manip2" href="/recarga">Manipular crédito</a>"""
+
+# O Validar é enviado por fetch e a resposta entra em #resultado, como no MCard
+# real (o botão de confirmar "aparece" na mesma página)
+FORMULARIO = """
+<a id="manip2" href="/recarga">Manipular crédito</a>
+<form id="form-recarga" method="post" action="/recarga/validar">
+    <input type="hidden" name="token" value="{token}">
+    <select id="tipoPg" name="tipoPg">
+        <option value="0" selected>Dinheiro</option>
+        <option value="1">PIX</option>
+    </select>
+    <input type="text" id="nrcartaocredito" name="nrcartaocredito">
+    <input type="text" id="acrescido" name="acrescido">
+    <input type="text" id="pagocredito" name="pagocredito">
+    <button type="submit" name="acao" value="validar">Validar</button>
+</form>
+<div id="resultado"></div>
+<script>
+document.getElementById('form-recarga').addEventListener('submit', function (e) {{
+    e.preventDefault();
+    const dados = new FormData(this);
+    dados.append('acao', 'validar');
+    fetch(this.action, {{method: 'POST', body: dados, credentials: 'include'}})
+        .then(r => r.text())
+        .then(html => {{ document.getElementById('resultado').innerHTML = html; }});
+}});
+</script>"""
+
+VALIDACAO = """
+<div class="row">
+    <div class="col-md-4"><span>{nome}</span></div>
+    <div class="col-md-4">Crédito: R$ {valor}</div>
+</div>
+<form method="post" action="/recarga/confirmar">
+    <input type="hidden" name="token" value="{token}">
+    <input type="hidden" name="cartao" value="{cartao}">
+    <input type="hidden" name="valor" value="{valor}">
+    <input type="hidden" name="tipoPg" value="{tipo}">
+    <button type="submit" id="btn-maisCredito" name="acao" value="confirmar">Confirmar</button>
+</form>"""
+
+ERRO_VALIDACAO = """<div class="alert">Cartão {cartao} não encontrado.</div>"""
+
+COMPROVANTE = """
+<div id="comprovante">
+    <h3>Comprovante de recarga #{numero}</h3>
+    <p>Cartão {cartao} - R$ {valor} - {forma}</p>
+</div>
+<script>window.print();</script>"""
+
+
+def nome_titular(cartao: str) -> str:
+    return f"Titular {cartao}"
+
+
+def criar_app(latencia: float = 0.0, validade_sessao: float = 0.0) -> Flask:
+    """
+    Monta o site falso. `latencia` (s) é somada a cada resposta e
+    `validade_sessao` (s, 0 = sem limite) derruba o login por inatividade.
+    Com `app.falhar_confirmacao = True`, a confirmação faz a recarga mas
+    responde com erro, como quando a resposta se perde no caminho.
+    """
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "bench"
+    app.contadores = Counter()
+    app.recargas = []
+    app.falhar_confirmacao = False
+    lock = threading.Lock()
+
+    def logado():
+        visto = session.get("visto_em")
+        if visto is None:
+            return False
+        if validade_sessao and time.time() - visto > validade_sessao:
+            session.clear()
+            return False
+        session["visto_em"] = time.time()
+        return True
+
+    def pagina(corpo):
+        return PAGINA.format(corpo=corpo)
+
+    def formulario():
+        return FORMULARIO.format(token=session.get("token", ""))
+
+    @app.before_request
+    def contar_e_atrasar():
+        with lock:
+            app.contadores[f"{request.method} {request.path}"] += 1
+        if latencia and not request.path.startswith("/_bench"):
+            time.sleep(latencia)
+
+    @app.route("/", methods=["GET"])
+    def raiz():
+        return pagina(INICIO if logado() else LOGIN)
+
+    @app.route("/login", methods=["POST"])
+    def login():
+        if not request.form.get("login") or not request.form.get("senha"):
+            return pagina(LOGIN)
+        session["visto_em"] = time.time()
+        session["token"] = f"{time.time():.6f}"
+        return redirect(url_for("raiz"))
+
+    @app.route("/recarga", methods=["GET"])
+    def recarga():
+        return pagina(formulario() if logado() else LOGIN)
+
+    @app.route("/recarga/validar", methods=["POST"])
+    def validar():
+        if not logado():
+            return pagina(LOGIN)
+        cartao = request.form.get("nrcartaocredito", "").strip()
+        valor = request.form.get("acrescido", "").strip()
+        if not cartao or cartao.startswith(PREFIXO_CARTAO_INVALIDO) or not valor:
+            return ERRO_VALIDACAO.format(cartao=cartao)
+        return VALIDACAO.format(nome=nome_titular(cartao), valor=valor, cartao=cartao,
+                                tipo=request.form.get("tipoPg", "0"), token=session.get("token", ""))
+
+    @app.route("/recarga/confirmar", methods=["GET", "POST"])
+    def confirmar():
+        if not logado():
+            return pagina(LOGIN)
+        if request.method == "GET":
+            return pagina(formulario())
+        forma = "PIX" if request.form.get("tipoPg") == "1" else "DINHEIRO"
+        with lock:
+            app.recargas.append((request.form.get("cartao"), request.form.get("valor"), forma))
+            numero = len(app.recargas)
+        if app.falhar_confirmacao:
+            return "Erro interno", 502
+        comprovante = COMPROVANTE.format(numero=numero, cartao=request.form.get("cartao"),
+                                         valor=request.form.get("valor"), forma=forma)
+        # O MCard devolve o formulário de novo junto com o comprovante
+        return pagina(formulario() + comprovante)
+
+    @app.route("/_bench/contadores", methods=["GET"])
+    def contadores():
+        with lock:
+            return {"requisicoes": dict(app.contadores), "recargas": len(app.recargas)}
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MCard falso para benchmarks.")
+    parser.add_argument("--porta", type=int, default=5100)
+    parser.add_argument("--latencia", type=float, default=0.15, help="segundos somados a cada resposta")
+    parser.add_argument("--validade-sessao", type=float, default=0.0, help="segundos até o login expirar (0 = nunca)")
+    args = parser.parse_args()
+    criar_app(args.latencia, args.validade_sessao).run(port=args.porta, threaded=True)
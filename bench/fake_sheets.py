@@ -0,0 +1,166 @@
+"""
+Google Sheets falso, em memória, para os benchmarks. Substitui o HTTPClient
+do gspread: os objetos Spreadsheet/Worksheet são os de verdade, então o
+código de automation.google_sheets roda sem mudanças e cada chamada que
+iria para a API é contada (e pode ter latência ou erros 429 simulados).
+"""
+import random
+import threading
+import time
+from collections import Counter
+
+import gspread
+from gspread.http_client import HTTPClient
+from gspread.utils import a1_range_to_grid_range
+
+
+class _RespostaFalsa:
+    """O mínimo de um requests.Response para montar um gspread APIError."""
+
+    def __init__(self, codigo, mensagem):
+        self.status_code = codigo
+        self.text = mensagem
+        self._corpo = {"error": {"code": codigo, "message": mensagem, "status": "RESOURCE_EXHAUSTED"}}
+
+    def json(self):
+        return self._corpo
+
+
+def _separar_intervalo(intervalo):
+    """Separa "'18/10/2026'!A2:C4" em ("18/10/2026", "A2:C4")."""
+    titulo, _, celulas = intervalo.rpartition("!")
+    return titulo.strip("'").replace("''", "'"), celulas
+
+
+class ClienteHttpFalso(HTTPClient):
+    """
+    Implementa as chamadas do HTTPClient do gspread usadas pela automação.
+    Herda dele só para passar na checagem de tipo do gspread.Worksheet; nada
+    do cliente real (auth, sessão HTTP) é inicializado.
+    """
+
+    def __init__(self, latencia: float = 0.0, taxa_429: float = 0.0):
+        self.latencia = latencia
+        self.taxa_429 = taxa_429
+        self.chamadas = Counter()
+        self._lock = threading.Lock()
+        self._abas = {}  # sheetId -> {"properties": ..., "celulas": {(linha, coluna): valor}}
+
+    def _chamar(self, nome):
+        with self._lock:
+            self.chamadas[nome] += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+        if self.taxa_429 and random.random() < self.taxa_429:
+            with self._lock:
+                self.chamadas["erros_429"] += 1
+            raise gspread.exceptions.APIError(_RespostaFalsa(429, "Quota exceeded (bench)"))
+
+    def _aba(self, titulo):
+        for aba in self._abas.values():
+            if aba["properties"]["title"] == titulo:
+                return aba
+        raise KeyError(titulo)
+
+    def criar_aba(self, titulo, linhas=1000, colunas=27, sheet_id=None):
+        sheet_id = sheet_id or len(self._abas) + 1
+        self._abas[sheet_id] = {
+            "properties": {"sheetId": sheet_id, "title": titulo, "index": len(self._abas), "sheetType": "GRID",
+                           "gridProperties": {"rowCount": linhas, "columnCount": colunas}},
+            "celulas": {},
+        }
+        return self._abas[sheet_id]["properties"]
+
+    # ===== API usada pelo gspread =====
+    def fetch_sheet_metadata(self, id, params=None):
+        self._chamar("fetch_sheet_metadata")
+        with self._lock:
+            return {
+                "properties": {"title": "Planilha (bench)"},
+                "sheets": [{"properties": dict(a["properties"])} for a in self._abas.values()],
+            }
+
+    def batch_update(self, id, body):
+        self._chamar("batch_update")
+        respostas = []
+        with self._lock:
+            for requisicao in body.get("requests", []):
+                if "addSheet" in requisicao:
+                    props = requisicao["addSheet"]["properties"]
+                    grade = props.get("gridProperties", {})
+                    propriedades = self.criar_aba(props["title"], grade.get("rowCount", 1000),
+                                                  grade.get("columnCount", 27), props.get("sheetId"))
+                    respostas.append({"addSheet": {"properties": propriedades}})
+                    continue
+                if "updateCells" in requisicao:
+                    # Só os valores interessam (o cabeçalho ocupa as primeiras linhas da coluna A)
+                    faixa = requisicao["updateCells"]["range"]
+                    celulas = self._abas[faixa["sheetId"]]["celulas"]
+                    for i, linha in enumerate(requisicao["updateCells"]["rows"]):
+                        for j, celula in enumerate(linha["values"]):
+                            valor = next(iter(celula.get("userEnteredValue", {"": ""}).values()))
+                            celulas[(faixa.get("startRowIndex", 0) + i, faixa.get("startColumnIndex", 0) + j)] = valor
+                if "updateSheetProperties" in requisicao:
+                    props = requisicao["updateSheetProperties"]["properties"]
+                    aba = self._abas[props["sheetId"]]
+                    aba["properties"]["gridProperties"].update(props.get("gridProperties", {}))
+                respostas.append({})
+        return {"spreadsheetId": id, "replies": respostas}
+
+    def values_get(self, id, intervalo, params=None):
+        self._chamar("values_get")
+        titulo, celulas = _separar_intervalo(intervalo)
+        grade = a1_range_to_grid_range(celulas)
+        with self._lock:
+            valores = self._aba(titulo)["celulas"]
+            coluna = grade.get("startColumnIndex", 0)
+            linhas = sorted(l for (l, c) in valores if c == coluna)
+            if not linhas:
+                return {"range": intervalo}
+            return {"range": intervalo, "majorDimension": "COLUMNS",
+                    "values": [[valores.get((l, coluna), "") for l in range(linhas[-1] + 1)]]}
+
+    def values_update(self, id, intervalo, params=None, body=None):
+        self._chamar("values_update")
+        titulo, celulas = _separar_intervalo(intervalo)
+        grade = a1_range_to_grid_range(celulas)
+        valores = body.get("values", []) if body else []
+        with self._lock:
+            aba = self._abas[self._aba(titulo)["properties"]["sheetId"]]
+            for i, linha in enumerate(valores):
+                for j, valor in enumerate(linha):
+                    aba["celulas"][(grade.get("startRowIndex", 0) + i, grade.get("startColumnIndex", 0) + j)] = valor
+        return {"spreadsheetId": id, "updatedRange": intervalo, "updatedRows": len(valores)}
+
+    def linhas(self, titulo):
+        """Conteúdo das colunas A:C da aba, linha a linha (para conferir o resultado)."""
+        with self._lock:
+            valores = self._aba(titulo)["celulas"]
+            ultima = max((l for (l, _) in valores), default=-1)
+            return [[valores.get((l, c), "") for c in range(3)] for l in range(ultima + 1)]
+
+
+class GspreadFalso:
+    """Faz o papel do gspread.Client devolvido por obter_cliente()."""
+
+    def __init__(self, latencia: float = 0.0, taxa_429: float = 0.0):
+        self.http_client = ClienteHttpFalso(latencia, taxa_429)
+
+    def open(self, title, folder_id=None):
+        self.http_client._chamar("open")
+        return gspread.Spreadsheet(self.http_client, {"id": "bench", "title": title})
+
+    @property
+    def chamadas(self) -> dict:
+        return dict(self.http_client.chamadas)
+
+
+def instalar(latencia: float = 0.0, taxa_429: float = 0.0) -> GspreadFalso:
+    """Faz automation.google_sheets usar o Sheets falso no lugar do Google."""
+    from automation import google_sheets
+
+    falso = GspreadFalso(latencia, taxa_429)
+    with google_sheets._gc_lock:
+        google_sheets._gc = falso
+    google_sheets.limpar_cache_aba()
+    return falso
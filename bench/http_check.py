@@ -0,0 +1,133 @@
+"""
+Confere o motor HTTP (automation.http_engine) contra o MCard falso: abre um
+Chrome, faz login e roda o MotorHttp nos casos que importam — recarga em
+dinheiro e em PIX, cartão inexistente, sessão expirada e confirmação sem
+comprovante, que não pode ser repetida pelo Selenium nem contar como falha
+da sessão. Termina com erro se algum caso falhar:
+
+    python -m bench.http_check
+
+Precisa do Chrome e do chromedriver, como o app.
+"""
+import argparse
+import os
+import tempfile
+from pathlib import Path
+
+from bench.load import iniciar_servidor
+
+
+def configurar_ambiente(porta, pasta):
+    """Aponta a automação para o MCard falso com o motor HTTP (antes de importar o config)."""
+    os.environ.update({
+        "MCARD_URL": f"http://127.0.0.1:{porta}/",
+        "MCARD_LOGIN": "bench",
+        "MCARD_SENHA": "bench",
+        "RECHARGE_ENGINE": "http",
+        "PRINT_MODE": "cdp",
+        "PRINT_COMMAND": "",
+        "PRINT_DIR": str(Path(pasta) / "comprovantes"),
+        "CARD_INDEX_PATH": str(Path(pasta) / "cartoes.db"),
+        "CHROME_PROFILE_DIR": "",
+        "SPECULATIVE_VALIDATION": "0",
+    })
+
+
+def executar(args):
+    pasta = tempfile.mkdtemp(prefix="mcard-http-")
+    configurar_ambiente(args.porta_mcard, pasta)
+
+    from bench import fake_mcard
+
+    mcard = fake_mcard.criar_app(args.latencia_mcard)
+    servidor = iniciar_servidor(mcard, args.porta_mcard)
+
+    # Só agora: o config lê as variáveis de ambiente no import
+    from automation.http_engine import (ConfirmacaoIncerta, LayoutInesperado, MENSAGEM_CONFIRMACAO_INCERTA,
+                                        MotorHttp)
+    from automation.pool import DriverPool
+    from automation.recharge import _executar_recarga
+
+    pool = DriverPool(tamanho=1)
+    if not pool.iniciar():
+        raise SystemExit("O Chrome não conseguiu fazer login no MCard falso.")
+    sessao = pool.checkout()
+
+    def recarga_em_dinheiro():
+        titular, comprovante = MotorHttp(sessao.driver).recarregar("DINHEIRO", "1234", "10.00")
+        assert titular == fake_mcard.nome_titular("1234"), titular
+        assert "window.print" in comprovante
+        assert mcard.recargas[-1] == ("1234", "10.00", "DINHEIRO"), mcard.recargas[-1]
+
+    def recarga_em_pix():
+        MotorHttp(sessao.driver).recarregar("PIX", "5678", "5.00")
+        assert mcard.recargas[-1] == ("5678", "5.00", "PIX"), mcard.recargas[-1]
+
+    def cartao_inexistente():
+        antes = len(mcard.recargas)
+        try:
+            MotorHttp(sessao.driver).recarregar("DINHEIRO", fake_mcard.PREFIXO_CARTAO_INVALIDO + "12", "10.00")
+        except LayoutInesperado:
+            assert len(mcard.recargas) == antes, "recarga feita para um cartão inexistente"
+            return
+        raise AssertionError("o cartão inexistente não foi recusado")
+
+    def sessao_expirada():
+        motor = MotorHttp(sessao.driver)
+        motor.http.cookies.clear()
+        try:
+            motor.recarregar("DINHEIRO", "1234", "10.00")
+        except LayoutInesperado as e:
+            assert "sessão expirada" in str(e), e
+            return
+        raise AssertionError("a recarga passou sem os cookies do login")
+
+    def confirmacao_incerta():
+        antes = len(mcard.recargas)
+        mcard.falhar_confirmacao = True
+        try:
+            try:
+                MotorHttp(sessao.driver).recarregar("DINHEIRO", "1234", "10.00")
+                raise AssertionError("a confirmação com erro foi aceita")
+            except ConfirmacaoIncerta:
+                pass
+            # Pela recarga completa: sem repetir pelo Selenium e sem contar contra a sessão
+            resultado = _executar_recarga("http-check", sessao, {
+                "forma_pagamento": "DINHEIRO", "numero_cartao": "1234", "valor": "10.00", "nome_pagador": "Bench",
+            })
+        finally:
+            mcard.falhar_confirmacao = False
+        assert resultado["status"] == "failed", resultado
+        assert resultado["message"] == MENSAGEM_CONFIRMACAO_INCERTA, resultado
+        assert sessao.falhas_seguidas == 0, f"{sessao.falhas_seguidas} falhas seguidas na sessão"
+        assert len(mcard.recargas) == antes + 2, f"{len(mcard.recargas) - antes} recargas feitas (esperadas 2)"
+
+    falhas = []
+    try:
+        for caso in (recarga_em_dinheiro, recarga_em_pix, cartao_inexistente, sessao_expirada, confirmacao_incerta):
+            try:
+                caso()
+                print(f"  ok      {caso.__name__}")
+            except Exception as e:
+                falhas.append(caso.__name__)
+                print(f"  FALHOU  {caso.__name__}: {e!r}")
+    finally:
+        pool.checkin(sessao)
+        pool.encerrar()
+        servidor.shutdown()
+    return falhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Confere o motor HTTP da recarga contra um MCard falso.")
+    parser.add_argument("--latencia-mcard", type=float, default=0.0, help="segundos por resposta do MCard falso")
+    parser.add_argument("--porta-mcard", type=int, default=5100)
+    args = parser.parse_args()
+    falhas = executar(args)
+    if falhas:
+        raise SystemExit(f"{len(falhas)} caso(s) falharam: {', '.join(falhas)}")
+    print("Motor HTTP OK.")
+
+
+if __name__ == "__main__":
+    main()
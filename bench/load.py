@@ -0,0 +1,281 @@
+"""
+Benchmark de ponta a ponta: sobe o MCard falso (bench.fake_mcard), troca o
+Google Sheets pelo falso em memória (bench.fake_sheets), inicia o app com o
+pool de navegadores apontando para o MCard falso e dispara recargas
+concorrentes em /recarregar, acompanhando cada uma pelo long-poll do /status.
+
+Mede p50/p95/p99 da latência (envio até o status final), recargas por minuto
+e quantas chamadas foram feitas ao MCard e à API do Sheets, e grava tudo em
+bench/results/ para comparar versões:
+
+    python -m bench.load --recargas 50 --concorrencia 5 --pool 2
+    python -m bench.load --recargas 50 --comparar bench/results/<anterior>.json
+
+Precisa do Chrome e do chromedriver, como o app.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+PASTA_RESULTADOS = Path(__file__).resolve().parent / "results"
+
+
+def percentil(valores_ordenados, p):
+    if not valores_ordenados:
+        return 0.0
+    indice = max(0, min(len(valores_ordenados) - 1, round(p / 100 * len(valores_ordenados)) - 1))
+    return valores_ordenados[indice]
+
+
+def iniciar_servidor(aplicacao, porta):
+    import logging
+    from werkzeug.serving import make_server
+
+    # Sem uma linha de log por requisição no meio das medições
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    servidor = make_server("127.0.0.1", porta, aplicacao, threaded=True)
+    threading.Thread(target=servidor.serve_forever, name=f"bench-http-{porta}", daemon=True).start()
+    return servidor
+
+
+def configurar_ambiente(args, pasta):
+    """Aponta o app para o MCard falso e para arquivos temporários (antes de importar o config)."""
+    os.environ.update({
+        "MCARD_URL": f"http://127.0.0.1:{args.porta_mcard}/",
+        "MCARD_LOGIN": "bench",
+        "MCARD_SENHA": "bench",
+        "POOL_SIZE": str(args.pool),
+        "QUEUE_CAPACITY": str(max(args.recargas, 1)),
+        "LEDGER_PATH": str(Path(pasta) / "recargas.db"),
+        "CARD_INDEX_PATH": str(Path(pasta) / "cartoes.db"),
+        "SPECULATIVE_VALIDATION": "1" if args.validacao_especulativa else "0",
+        "TASK_STORE_PATH": "",
+        "KEEPALIVE_INTERVAL": "0",
+        "PRINT_MODE": args.impressao,
+        "PRINT_COMMAND": "",
+        "PRINT_DIR": str(Path(pasta) / "comprovantes"),
+        "FILL_MODE": args.preenchimento,
+        "RECHARGE_ENGINE": args.motor,
+        "SHEETS_SYNC_ENABLED": "1",
+        "METRICS_ENABLED": "1",
+        # O bench roda os navegadores no próprio processo, com perfis descartáveis
+        "EXECUTION_MODE": "local",
+        "JOB_QUEUE_PATH": str(Path(pasta) / "fila.db"),
+        "CHROME_PROFILE_DIR": "",
+    })
+
+
+def enviar_recarga(url_app, dados, espera_status=30):
+    """Envia uma recarga e acompanha até o fim. Devolve (status, latência, vezes que recebeu 503)."""
+    import requests
+
+    inicio = time.perf_counter()
+    recusas = 0
+    with requests.Session() as http:
+        while True:
+            resposta = http.post(f"{url_app}/recarregar", json=dados, timeout=30)
+            if resposta.status_code != 503:
+                break
+            recusas += 1
+            time.sleep(float(resposta.headers.get("Retry-After", "1")))
+        if resposta.status_code != 202:
+            return "erro_envio", time.perf_counter() - inicio, recusas
+        task_id = resposta.json()["task_id"]
+        while True:
+            estado = http.get(f"{url_app}/status/{task_id}", params={"wait": espera_status},
+                              timeout=espera_status + 10).json()
+            if estado["status"] in ("completed", "failed"):
+                return estado["status"], time.perf_counter() - inicio, recusas
+
+
+def gerar_recargas(quantidade, fracao_pix, semente):
+    aleatorio = random.Random(semente)
+    return [
+        {
+            "forma_pagamento": "PIX" if aleatorio.random() < fracao_pix else "DINHEIRO",
+            "numero_cartao": str(aleatorio.randint(1000, 9999)),
+            "valor": f"{aleatorio.choice([2, 5, 10, 15, 20, 50])}.00",
+            "nome_pagador": f"Bench {i}",
+        }
+        for i in range(quantidade)
+    ]
+
+
+def aguardar_sincronizacao(timeout):
+    """Espera o SheetsSync esvaziar o livro; devolve quanto tempo levou (ou None se estourou)."""
+    from automation.google_sheets import CHECKPOINT_SHEETS
+    from utils.ledger import obter_ledger
+
+    ledger = obter_ledger()
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < timeout:
+        if not ledger.listar(apos_id=ledger.ler_checkpoint(CHECKPOINT_SHEETS), limite=1):
+            return time.perf_counter() - inicio
+        time.sleep(0.1)
+    return None
+
+
+def versao_git():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def executar(args):
+    pasta = tempfile.mkdtemp(prefix="mcard-bench-")
+    configurar_ambiente(args, pasta)
+
+    from bench import fake_mcard, fake_sheets
+
+    mcard = fake_mcard.criar_app(args.latencia_mcard, args.validade_sessao)
+    servidor_mcard = iniciar_servidor(mcard, args.porta_mcard)
+
+    # Só agora: o config lê as variáveis de ambiente no import
+    import app as aplicativo
+    from utils.metrics import metricas
+
+    sheets = fake_sheets.instalar(args.latencia_sheets, args.taxa_429)
+
+    inicio_boot = time.perf_counter()
+    if not aplicativo.pool.iniciar():
+        raise SystemExit("Nenhuma sessão do navegador conseguiu fazer login no MCard falso.")
+    boot = time.perf_counter() - inicio_boot
+    aplicativo.fila.iniciar()
+    aplicativo.sincronizador.iniciar()
+    servidor_app = iniciar_servidor(aplicativo.app, args.porta_app)
+    url_app = f"http://127.0.0.1:{args.porta_app}"
+
+    recargas = gerar_recargas(args.recargas, args.fracao_pix, args.semente)
+    requisicoes_antes = sum(mcard.contadores.values())
+    print(f"Disparando {len(recargas)} recargas ({args.concorrencia} simultâneas, {args.pool} sessões)...")
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concorrencia) as executor:
+        resultados = list(executor.map(enviar_recarga, [url_app] * len(recargas), recargas))
+    duracao = time.perf_counter() - inicio
+    sincronizacao = aguardar_sincronizacao(args.timeout_sync)
+
+    latencias = sorted(latencia for status, latencia, _ in resultados if status == "completed")
+    concluidas = len(latencias)
+    requisicoes_mcard = sum(mcard.contadores.values()) - requisicoes_antes
+    chamadas_sheets = sheets.chamadas
+    relatorio = {
+        "rotulo": args.rotulo,
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "versao": versao_git(),
+        "parametros": {
+            "recargas": args.recargas, "concorrencia": args.concorrencia, "pool": args.pool,
+            "motor": args.motor, "preenchimento": args.preenchimento, "impressao": args.impressao,
+            "validacao_especulativa": args.validacao_especulativa,
+            "latencia_mcard": args.latencia_mcard, "latencia_sheets": args.latencia_sheets,
+            "taxa_429": args.taxa_429, "fracao_pix": args.fracao_pix, "semente": args.semente,
+        },
+        "boot_pool_s": round(boot, 3),
+        "duracao_s": round(duracao, 3),
+        "recargas": {
+            "concluidas": concluidas,
+            "falhas": sum(1 for status, _, _ in resultados if status != "completed"),
+            "recusas_503": sum(recusas for _, _, recusas in resultados),
+        },
+        "recargas_por_minuto": round(concluidas / duracao * 60, 2) if duracao else 0.0,
+        "latencia_s": {
+            "p50": round(percentil(latencias, 50), 3),
+            "p95": round(percentil(latencias, 95), 3),
+            "p99": round(percentil(latencias, 99), 3),
+            "media": round(sum(latencias) / concluidas, 3) if concluidas else 0.0,
+            "max": round(latencias[-1], 3) if latencias else 0.0,
+        },
+        "mcard": {
+            "requisicoes": requisicoes_mcard,
+            "por_recarga": round(requisicoes_mcard / concluidas, 2) if concluidas else 0.0,
+            "por_rota": dict(mcard.contadores),
+        },
+        "sheets": {
+            "chamadas": sum(v for k, v in chamadas_sheets.items() if k != "erros_429"),
+            "por_tipo": chamadas_sheets,
+            "sincronizacao_s": round(sincronizacao, 3) if sincronizacao is not None else None,
+        },
+        "etapas": metricas.resumo()["latencias"],
+    }
+
+    servidor_app.shutdown()
+    servidor_mcard.shutdown()
+    aplicativo.pool.encerrar()
+    return relatorio
+
+
+def salvar(relatorio, pasta=PASTA_RESULTADOS):
+    pasta.mkdir(parents=True, exist_ok=True)
+    nome = datetime.now().strftime("%Y%m%d-%H%M%S") + (f"-{relatorio['rotulo']}" if relatorio["rotulo"] else "")
+    caminho = pasta / f"{nome}.json"
+    caminho.write_text(json.dumps(relatorio, indent=2, ensure_ascii=False), encoding="utf-8")
+    return caminho
+
+
+def comparar(relatorio, anterior, tolerancia):
+    """Mostra a variação em relação a um resultado anterior; devolve False se houve regressão."""
+    ok = True
+    linhas = [("p50 (s)", "latencia_s", "p50", False), ("p95 (s)", "latencia_s", "p95", False),
+              ("p99 (s)", "latencia_s", "p99", False), ("recargas/min", "recargas_por_minuto", None, True),
+              ("chamadas MCard/recarga", "mcard", "por_recarga", False), ("chamadas Sheets", "sheets", "chamadas", False)]
+    print(f"\nComparação com {anterior.get('rotulo') or anterior.get('data')} ({anterior.get('versao')}):")
+    for titulo, secao, campo, maior_melhor in linhas:
+        antes = anterior.get(secao) if campo is None else (anterior.get(secao) or {}).get(campo)
+        agora = relatorio.get(secao) if campo is None else relatorio[secao].get(campo)
+        if not antes or agora is None:
+            continue
+        variacao = (agora - antes) / antes
+        piorou = -variacao if maior_melhor else variacao
+        marca = ""
+        if piorou > tolerancia:
+            marca, ok = "  <-- REGRESSÃO", False
+        print(f"  {titulo:<24} {antes:>10} -> {agora:<10} ({variacao:+.0%}){marca}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga do app de recargas contra um MCard falso.")
+    parser.add_argument("--recargas", type=int, default=50)
+    parser.add_argument("--concorrencia", type=int, default=5, help="clientes disparando recargas ao mesmo tempo")
+    parser.add_argument("--pool", type=int, default=2, help="sessões do Chrome (POOL_SIZE)")
+    parser.add_argument("--motor", choices=["selenium", "http"], default="selenium")
+    parser.add_argument("--preenchimento", choices=["script", "passos"], default="script")
+    parser.add_argument("--impressao", choices=["cdp", "preview"], default="cdp")
+    parser.add_argument("--validacao-especulativa", action="store_true",
+                        help="valida o cartão nas sessões ociosas antes da recarga (SPECULATIVE_VALIDATION)")
+    parser.add_argument("--latencia-mcard", type=float, default=0.15, help="segundos por resposta do MCard falso")
+    parser.add_argument("--validade-sessao", type=float, default=0.0, help="segundos até o login do MCard expirar")
+    parser.add_argument("--latencia-sheets", type=float, default=0.2, help="segundos por chamada à API do Sheets")
+    parser.add_argument("--taxa-429", type=float, default=0.0, help="fração das chamadas ao Sheets que devolvem 429")
+    parser.add_argument("--fracao-pix", type=float, default=0.5)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--porta-mcard", type=int, default=5100)
+    parser.add_argument("--porta-app", type=int, default=5101)
+    parser.add_argument("--timeout-sync", type=float, default=120.0, help="espera máxima pelo envio ao Sheets")
+    parser.add_argument("--rotulo", default="", help="nome do resultado (ex.: versão ou mudança testada)")
+    parser.add_argument("--comparar", type=Path, help="resultado anterior (JSON) para comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="piora relativa aceita antes de acusar regressão")
+    args = parser.parse_args()
+    anterior = json.loads(args.comparar.read_text(encoding="utf-8")) if args.comparar else None
+
+    relatorio = executar(args)
+    caminho = salvar(relatorio)
+    print(json.dumps({k: relatorio[k] for k in ("duracao_s", "recargas", "recargas_por_minuto", "latencia_s")},
+                     indent=2, ensure_ascii=False))
+    print(f"MCard: {relatorio['mcard']['requisicoes']} requisições | Sheets: {relatorio['sheets']['chamadas']} chamadas")
+    print(f"Resultado salvo em {caminho}")
+    if anterior and not comparar(relatorio, anterior, args.tolerancia):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,4 +5,80 @@ load_dotenv()
 
 MCARD_LOGIN = os.getenv("MCARD_LOGIN")
 MCARD_SENHA = os.getenv("MCARD_SENHA")
-MCARD_URL = os.getenv("MCARD_URL")
\ No newline at end of file
+MCARD_URL = os.getenv("MCARD_URL")
+
+# Quantidade de sessões do Chrome (já logadas) mantidas no pool
+POOL_SIZE = int(os.getenv("POOL_SIZE", "2"))
+
+# Máximo de recargas aguardando na fila antes de responder "fila cheia" (503)
+QUEUE_CAPACITY = int(os.getenv("QUEUE_CAPACITY", "20"))
+
+# Arquivo SQLite do livro de recargas (substitui o antigo recargas.txt)
+LEDGER_PATH = os.getenv("LEDGER_PATH", "recargas.db")
+
+# Sincroniza automaticamente as recargas PIX com o Google Sheets em segundo plano
+SHEETS_SYNC_ENABLED = os.getenv("SHEETS_SYNC_ENABLED", "1") == "1"
+
+# Estado das tarefas: máximo em memória, validade (s) e arquivo SQLite ("" desliga a persistência)
+TASK_STORE_MAX = int(os.getenv("TASK_STORE_MAX", "5000"))
+TASK_STORE_TTL = float(os.getenv("TASK_STORE_TTL", str(24 * 60 * 60)))
+TASK_STORE_PATH = os.getenv("TASK_STORE_PATH", "tarefas.db")
+
+# Intervalo (s) do keep-alive das sessões ociosas do MCard (0 desliga)
+KEEPALIVE_INTERVAL = float(os.getenv("KEEPALIVE_INTERVAL", "120"))
+
+# Impressão do comprovante: "preview" (diálogo do Chrome) ou "cdp" (PDF direto via DevTools)
+PRINT_MODE = os.getenv("PRINT_MODE", "preview")
+# Comando que envia o PDF à impressora no modo "cdp"; {arquivo} vira o caminho do PDF
+# (ex.: lp {arquivo}  |  SumatraPDF.exe -print-to-default -silent {arquivo})
+PRINT_COMMAND = os.getenv("PRINT_COMMAND", "")
+# Pasta onde os PDFs dos comprovantes são gravados no modo "cdp"
+PRINT_DIR = os.getenv("PRINT_DIR", "comprovantes")
+
+# Preenchimento da recarga: "script" (uma chamada ao navegador) ou "passos" (campo a campo)
+FILL_MODE = os.getenv("FILL_MODE", "script")
+
+# Motor da recarga: "selenium" (navegador) ou "http" (requisições com os cookies do navegador; exige PRINT_MODE=cdp)
+RECHARGE_ENGINE = os.getenv("RECHARGE_ENGINE", "selenium")
+# Texto que precisa aparecer na resposta da confirmação para o motor HTTP considerar a recarga feita
+HTTP_SUCCESS_MARKER = os.getenv("HTTP_SUCCESS_MARKER", "window.print")
+
+# Métricas de latência por etapa e contadores (expostas em /metrics); 0 desliga
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+# Índice cartão → titular (LRU): máximo em memória e arquivo SQLite ("" mantém só em memória)
+CARD_INDEX_MAX = int(os.getenv("CARD_INDEX_MAX", "20000"))
+CARD_INDEX_PATH = os.getenv("CARD_INDEX_PATH", "cartoes.db")
+# Valida no MCard, numa sessão ociosa, os cartões que ainda não estão no índice enquanto o número é digitado
+SPECULATIVE_VALIDATION = os.getenv("SPECULATIVE_VALIDATION", "1") == "1"
+
+# Execução das recargas: "local" (o próprio app abre os navegadores) ou "workers" (o app só atende
+# HTTP e processos worker.py, cada um com o seu Chrome, consomem a fila gravada em JOB_QUEUE_PATH)
+EXECUTION_MODE = os.getenv("EXECUTION_MODE", "local")
+# Arquivo SQLite da fila compartilhada entre o app e os workers no modo "workers"
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "fila.db")
+# Sessões do Chrome (e recargas simultâneas) em cada processo worker.py
+WORKER_SESSIONS = int(os.getenv("WORKER_SESSIONS", "1"))
+
+# Perfil enxuto do Chrome: carregamento "eager", sem imagens/fontes/analytics e sem serviços em segundo plano
+CHROME_LEAN = os.getenv("CHROME_LEAN", "0") == "1"
+# Padrões de URL bloqueados no perfil enxuto (separados por vírgula; "*" casa com qualquer trecho)
+CHROME_BLOCKED_URLS = os.getenv(
+    "CHROME_BLOCKED_URLS",
+    "*://*/*.png,*://*/*.jpg,*://*/*.jpeg,*://*/*.gif,*://*/*.webp,*://*/*.svg,*://*/*.ico,"
+    "*://*/*.woff,*://*/*.woff2,*://*/*.ttf,*://*/*.otf,*://fonts.googleapis.com/*,*://fonts.gstatic.com/*,"
+    "*://*.google-analytics.com/*,*://*.googletagmanager.com/*,*://*.doubleclick.net/*,*://*.hotjar.com/*",
+)
+# Exceções ao bloqueio (ex.: o logotipo impresso no comprovante), no mesmo formato
+CHROME_ALLOWED_URLS = os.getenv("CHROME_ALLOWED_URLS", "")
+# Pasta dos perfis persistentes do Chrome (um por sessão: cache e cookies sobrevivem ao reinício); "" usa perfis temporários
+CHROME_PROFILE_DIR = os.getenv("CHROME_PROFILE_DIR", "")
+
+# Esperas por elementos da página: o tempo limite de cada seletor acompanha o p99 observado (0 usa sempre o máximo)
+WAIT_ADAPTIVE = os.getenv("WAIT_ADAPTIVE", "1") == "1"
+# Menor e maior tempo limite (s) de uma espera; o maior vale enquanto o seletor ainda não tem amostras suficientes
+WAIT_MIN_TIMEOUT = float(os.getenv("WAIT_MIN_TIMEOUT", "1"))
+WAIT_MAX_TIMEOUT = float(os.getenv("WAIT_MAX_TIMEOUT", "15"))
+# Menor tempo limite (s) da espera pelo botão de confirmar depois do Validar: desistir cedo deixa
+# uma resposta atrasada do MCard sem dono (a recarga pode ser confirmada mesmo assim)
+WAIT_CONFIRM_MIN_TIMEOUT = float(os.getenv("WAIT_CONFIRM_MIN_TIMEOUT", "15"))
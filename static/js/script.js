@@ -22,7 +22,12 @@ document.addEventListener("DOMContentLoaded", () => {
   
     const main = document.getElementById("mainContainer");
     const panel = document.getElementById("panel");
+    const loadingText = containers.loading.querySelector(".loading-text");
+    const warmupBanner = document.getElementById("warmupBanner");
+    const btnSubmit = document.getElementById("btnSubmit");
+    const titularHint = document.getElementById("titularHint");
     let pollInterval = null;
+    let lookupTimer = null;
   
     function show(el) {
       el.classList.remove("is-hidden");
@@ -125,12 +130,36 @@ document.addEventListener("DOMContentLoaded", () => {
   
     numeroCartao.addEventListener("input", () => {
       updateFieldsVisibility();
+      scheduleTitularLookup();
     });
   
     valorField.addEventListener("input", () => {
       updateFieldsVisibility();
     });
   
+    // ===== Titular do cartão (consultado enquanto o número é digitado) =====
+    function scheduleTitularLookup() {
+      clearTimeout(lookupTimer);
+      hide(titularHint);
+      const cartao = numeroCartao.value.trim();
+      if (!/^\d{4,6}$/.test(cartao)) return;
+      lookupTimer = setTimeout(() => lookupTitular(cartao), 250);
+    }
+
+    async function lookupTitular(cartao) {
+      try {
+        // O servidor pode validar o cartão no MCard em segundo plano; espera um pouco por isso
+        const res = await fetch(`/cartao/${cartao}?wait=8`);
+        const data = await res.json();
+        // Ignora respostas de um número que já foi alterado
+        if (numeroCartao.value.trim() !== cartao || !data.titular) return;
+        titularHint.textContent = `Titular: ${data.titular}`;
+        show(titularHint);
+      } catch {
+        // A dica é opcional: sem ela a recarga segue normalmente
+      }
+    }
+
     // ===== Submit + Polling =====
     form.addEventListener("submit", async (e) => {
       e.preventDefault();
@@ -170,22 +199,55 @@ document.addEventListener("DOMContentLoaded", () => {
       containers.form.querySelectorAll(".form-group").forEach(group => hide(group));
       hide(containers.success);
       hide(containers.error);
+      updateQueuePosition(null);
   
       // Quando form terminar de colapsar → mostra loading
       hide(containers.form, () => {
         show(containers.loading);
       });
   
+      // Navegadores com SSE recebem o estado por push; os antigos seguem no polling
+      if (window.EventSource) {
+        watchWithEventSource(taskId);
+      } else {
+        watchWithPolling(taskId);
+      }
+    }
+
+    function handleStatus(status) {
+      if (status.status === "completed") {
+        showSuccess();
+        return true;
+      }
+      if (status.status === "failed") {
+        showError(status.message || "Falha na recarga.");
+        return true;
+      }
+      updateQueuePosition(status.posicao);
+      return false;
+    }
+
+    function watchWithEventSource(taskId) {
+      const source = new EventSource(`/status/${taskId}/stream`);
+      source.onmessage = (event) => {
+        if (handleStatus(JSON.parse(event.data))) {
+          source.close();
+        }
+      };
+      source.onerror = () => {
+        // Conexão caiu (proxy, servidor reiniciando...): continua via polling
+        source.close();
+        watchWithPolling(taskId);
+      };
+    }
+
+    function watchWithPolling(taskId) {
       pollInterval = setInterval(async () => {
         try {
           const res = await fetch(`/status/${taskId}`);
           const status = await res.json();
-          if (status.status === "completed") {
-            clearInterval(pollInterval);
-            showSuccess();
-          } else if (status.status === "failed") {
+          if (handleStatus(status)) {
             clearInterval(pollInterval);
-            showError(status.message || "Falha na recarga.");
           }
         } catch {
           clearInterval(pollInterval);
@@ -194,6 +256,10 @@ document.addEventListener("DOMContentLoaded", () => {
       }, 1000);
     }
   
+    function updateQueuePosition(posicao) {
+      loadingText.textContent = posicao ? `Na fila: posição ${posicao}...` : "Processando...";
+    }
+
     function showSuccess() {
       hide(containers.loading, () => show(containers.success));
       setTimeout(resetForm, 2500);
@@ -212,6 +278,8 @@ document.addEventListener("DOMContentLoaded", () => {
     function resetForm() {
       main.setAttribute("aria-busy", "false");
       form.reset();
+      clearTimeout(lookupTimer);
+      hide(titularHint);
   
       show(containers.form);
       hide(containers.loading);
@@ -225,7 +293,25 @@ document.addEventListener("DOMContentLoaded", () => {
       hide(groups.submit);
     }
   
+    // ===== Aquecimento: espera os navegadores fazerem login =====
+    async function checkReady() {
+      try {
+        const res = await fetch("/pronto");
+        const ready = (await res.json()).pronto;
+        btnSubmit.disabled = !ready;
+        if (ready) {
+          hide(warmupBanner);
+          return;
+        }
+        show(warmupBanner);
+      } catch {
+        show(warmupBanner);
+      }
+      setTimeout(checkReady, 2000);
+    }
+
     // ===== Inicialização =====
     // Verifica campos preenchidos na inicialização (útil para refresh da página)
     updateFieldsVisibility();
+    checkReady();
   });
\ No newline at end of file
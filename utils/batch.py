@@ -0,0 +1,44 @@
+import threading
+import time
+
+from utils.logger import logger
+
+
+class Lote:
+    """
+    Um conjunto de recargas enviado de uma vez (/recarregar/lote).
+
+    Cada worker devolve aqui o registro da recarga que deu certo em vez de
+    gravá-lo sozinho; quando a última recarga do lote termina (com sucesso
+    ou não), `ao_concluir(registros)` recebe todos de uma vez, para uma
+    única gravação no livro e um único envio ao Google Sheets.
+    """
+
+    def __init__(self, lote_id: str, total: int, ao_concluir):
+        self.lote_id = lote_id
+        self.total = total
+        self.criado_em = time.time()
+        self.concluido = threading.Event()
+        self._ao_concluir = ao_concluir
+        self._lock = threading.Lock()
+        self._registros = []
+        self._pendentes = total
+
+    def adicionar_registro(self, registro: tuple) -> None:
+        """Guarda (task_id, forma, nome, valor, cartão) de uma recarga concluída."""
+        with self._lock:
+            self._registros.append(registro)
+
+    def item_concluido(self) -> None:
+        """Marca uma recarga do lote como terminada; a última dispara a gravação."""
+        with self._lock:
+            self._pendentes -= 1
+            if self._pendentes > 0:
+                return
+            registros, self._registros = self._registros, []
+        try:
+            self._ao_concluir(registros)
+        except Exception as e:
+            logger.error(f"LOTE {self.lote_id}: Erro ao gravar {len(registros)} recargas: {e}")
+        finally:
+            self.concluido.set()
@@ -0,0 +1,94 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from config import CARD_INDEX_MAX, CARD_INDEX_PATH
+from utils.logger import logger
+
+# Nome usado quando o MCard não mostrou o titular (não entra no índice)
+TITULAR_DESCONHECIDO = "Desconhecido"
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS titulares (
+    cartao TEXT PRIMARY KEY,
+    titular TEXT NOT NULL,
+    atualizado_em REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_titulares_atualizado_em ON titulares (atualizado_em);
+"""
+
+
+class IndiceCartoes:
+    """
+    Índice local cartão → titular, alimentado por cada recarga concluída.
+
+    Fica em memória como LRU (os cartões menos usados saem primeiro ao
+    passar de `max_cartoes`) e, com `caminho`, também em SQLite, sendo
+    recarregado ao reiniciar o aplicativo.
+    """
+
+    def __init__(self, max_cartoes: int = CARD_INDEX_MAX, caminho: str = CARD_INDEX_PATH):
+        self.max_cartoes = max(1, max_cartoes)
+        self._cartoes = OrderedDict()  # do menos para o mais recente
+        self._lock = threading.Lock()
+        self._conn = None
+        if caminho:
+            self._abrir(caminho)
+
+    def _abrir(self, caminho: str) -> None:
+        self._conn = sqlite3.connect(caminho, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.executescript(ESQUEMA)
+        linhas = self._conn.execute(
+            "SELECT cartao, titular FROM titulares ORDER BY atualizado_em DESC LIMIT ?", (self.max_cartoes,)
+        ).fetchall()
+        for cartao, titular in reversed(linhas):
+            self._cartoes[cartao] = titular
+        if linhas:
+            logger.info(f"ÍNDICE DE CARTÕES: {len(linhas)} titulares carregados.")
+
+    def _executar(self, sql: str, parametros) -> None:
+        if self._conn is None:
+            return
+        try:
+            with self._conn:
+                self._conn.executemany(sql, parametros)
+        except sqlite3.Error as e:
+            logger.error(f"ÍNDICE DE CARTÕES: Erro ao gravar: {e}")
+
+    def obter(self, cartao: str):
+        """Titular do cartão ou None; a consulta conta como uso para o LRU."""
+        cartao = str(cartao)
+        with self._lock:
+            titular = self._cartoes.get(cartao)
+            if titular is not None:
+                self._cartoes.move_to_end(cartao)
+            return titular
+
+    def registrar(self, cartao: str, titular: str) -> None:
+        titular = (titular or "").strip()
+        if not titular or titular == TITULAR_DESCONHECIDO:
+            return
+        cartao = str(cartao)
+        with self._lock:
+            inalterado = self._cartoes.get(cartao) == titular
+            self._cartoes[cartao] = titular
+            self._cartoes.move_to_end(cartao)
+            removidos = []
+            while len(self._cartoes) > self.max_cartoes:
+                removidos.append(self._cartoes.popitem(last=False)[0])
+            if not inalterado:
+                self._executar(
+                    "INSERT INTO titulares (cartao, titular, atualizado_em) VALUES (?, ?, ?) "
+                    "ON CONFLICT (cartao) DO UPDATE SET titular = excluded.titular, "
+                    "atualizado_em = excluded.atualizado_em",
+                    [(cartao, titular, time.time())],
+                )
+            self._executar("DELETE FROM titulares WHERE cartao = ?", [(c,) for c in removidos])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._cartoes)
@@ -0,0 +1,61 @@
+import threading
+from collections import defaultdict
+
+
+class ResumoDiario:
+    """
+    Totais das recargas em memória: quantidade e soma (em centavos) por dia,
+    forma de pagamento e hora. Cada recarga atualiza um único contador
+    (O(1)), então o fechamento do caixa não precisa ler o livro nem o Sheets.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # data (AAAA-MM-DD) -> forma de pagamento -> hora (0-23) -> [quantidade, centavos]
+        self._dias = defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: [0, 0])))
+
+    def registrar(self, data: str, hora: int, forma_pagamento: str, valor_centavos: int,
+                  quantidade: int = 1) -> None:
+        with self._lock:
+            totais = self._dias[data][forma_pagamento][hora]
+            totais[0] += quantidade
+            totais[1] += valor_centavos
+
+    def carregar(self, linhas) -> None:
+        """Soma linhas (data, hora, forma, quantidade, centavos) já agregadas (ex.: GROUP BY do livro)."""
+        for data, hora, forma_pagamento, quantidade, centavos in linhas:
+            self.registrar(data, int(hora), forma_pagamento, centavos, quantidade)
+
+    def dias(self) -> list:
+        with self._lock:
+            return sorted(self._dias)
+
+    def dia(self, data: str) -> dict:
+        """Totais do dia por forma de pagamento e por hora (valores em centavos e em reais)."""
+        with self._lock:
+            formas = {forma: {hora: list(t) for hora, t in horas.items()}
+                      for forma, horas in self._dias.get(data, {}).items()}
+
+        def totais(quantidade, centavos):
+            return {"quantidade": quantidade, "valor_centavos": centavos, "valor": centavos / 100}
+
+        por_forma, por_hora = {}, defaultdict(lambda: defaultdict(lambda: [0, 0]))
+        quantidade_total = centavos_total = 0
+        for forma, horas in sorted(formas.items()):
+            quantidade = sum(t[0] for t in horas.values())
+            centavos = sum(t[1] for t in horas.values())
+            por_forma[forma] = totais(quantidade, centavos)
+            quantidade_total += quantidade
+            centavos_total += centavos
+            for hora, (q, c) in horas.items():
+                por_hora[hora][forma][0] += q
+                por_hora[hora][forma][1] += c
+        return {
+            "data": data,
+            "total": totais(quantidade_total, centavos_total),
+            "por_forma": por_forma,
+            "por_hora": [
+                {"hora": hora, **{forma: totais(q, c) for forma, (q, c) in sorted(formas_hora.items())}}
+                for hora, formas_hora in sorted(por_hora.items())
+            ],
+        }
@@ -0,0 +1,227 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from config import JOB_QUEUE_PATH
+from utils.job_queue import FilaCheia, AMOSTRAS_ESPERA
+from utils.logger import logger
+from utils.metrics import metricas
+
+# Intervalo (s) entre consultas à tabela (reserva no worker, resultados no app)
+INTERVALO_CONSULTA = 0.2
+# Intervalo (s) entre os sinais de vida de cada worker
+INTERVALO_SINAL = 5
+# Sem sinal de vida por esse tempo (s), o worker é dado como morto
+WORKER_SEM_SINAL = 30
+# Trabalhos concluídos e já registrados ficam na tabela por esse tempo (s)
+RETENCAO_CONCLUIDOS = 24 * 60 * 60
+
+# Resultado das recargas que estavam num worker que parou de responder
+MENSAGEM_WORKER_PERDIDO = "O worker parou durante esta recarga. Confira no MCard se ela foi concluída."
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS trabalhos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    estado TEXT NOT NULL,
+    worker TEXT,
+    resultado TEXT,
+    aplicado INTEGER NOT NULL DEFAULT 0,
+    enfileirado_em REAL NOT NULL,
+    iniciado_em REAL,
+    concluido_em REAL
+);
+CREATE INDEX IF NOT EXISTS idx_trabalhos_estado ON trabalhos (estado, aplicado, id);
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    estado TEXT NOT NULL,
+    visto_em REAL NOT NULL
+);
+"""
+
+
+class FilaDuravel:
+    """
+    Fila de recargas em SQLite, compartilhada entre o app e os processos
+    worker.py (EXECUTION_MODE=workers).
+
+    O app enfileira (`enviar`) e acompanha os resultados numa thread
+    (`iniciar`), chamando `ao_concluir(job_id, payload, resultado)` uma vez
+    por trabalho terminado; cada worker reserva o próximo trabalho
+    (`reservar`), roda a recarga no seu Chrome e grava o resultado
+    (`concluir`). Um trabalho pendente sobrevive ao reinício de qualquer um
+    dos lados. A interface do lado do app é a mesma da JobQueue.
+    """
+
+    def __init__(self, ao_concluir=None, capacidade: int = None, caminho: str = JOB_QUEUE_PATH):
+        self._ao_concluir = ao_concluir
+        self.capacidade = max(1, capacidade) if capacidade else None
+        self._conn = sqlite3.connect(caminho, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.executescript(ESQUEMA)
+        self._lock = threading.Lock()
+        # Payloads enviados por este processo, com o que não vira JSON (ex.: o Lote)
+        self._locais = {}
+        self._enviados = 0
+        self._rejeitados = 0
+        self._concluidos = 0
+        self._esperas = deque(maxlen=AMOSTRAS_ESPERA)
+        self._thread = None
+
+    def _executar(self, sql: str, parametros=()) -> list:
+        with self._lock, self._conn:
+            return self._conn.execute(sql, parametros).fetchall()
+
+    def _contar(self, estado: str) -> int:
+        return self._executar("SELECT COUNT(*) FROM trabalhos WHERE estado = ?", (estado,))[0][0]
+
+    # ===== Lado do app =====
+    def iniciar(self) -> None:
+        self._thread = threading.Thread(target=self._acompanhar, name="fila-resultados", daemon=True)
+        self._thread.start()
+
+    def enviar(self, job_id: str, payload, bloquear: bool = False, timeout: float = None) -> int:
+        """Enfileira um trabalho e devolve sua posição na fila (1 = próximo)."""
+        limite = time.monotonic() + timeout if timeout is not None else None
+        while self.capacidade and self._contar("pendente") >= self.capacidade:
+            if not bloquear or (limite is not None and time.monotonic() >= limite):
+                self._rejeitados += 1
+                raise FilaCheia(f"Fila cheia ({self.capacidade} recargas aguardando).")
+            time.sleep(INTERVALO_CONSULTA)
+        self._locais[job_id] = payload
+        self._executar(
+            "INSERT INTO trabalhos (job_id, payload, estado, enfileirado_em) VALUES (?, ?, 'pendente', ?)",
+            (job_id, json.dumps(payload, default=lambda _: None), time.time()),
+        )
+        self._enviados += 1
+        return self._contar("pendente")
+
+    def posicao(self, job_id: str):
+        """Posição do trabalho na fila (1 = próximo) ou None se já saiu dela."""
+        posicao = self._executar(
+            "SELECT COUNT(*) FROM trabalhos WHERE estado = 'pendente' AND id <= "
+            "(SELECT id FROM trabalhos WHERE job_id = ? AND estado = 'pendente')", (job_id,)
+        )[0][0]
+        return posicao or None
+
+    def em_andamento(self, job_ids: list) -> set:
+        """Dos trabalhos informados, os que ainda vão ter resultado: na fila, num worker ou por registrar."""
+        encontrados = set()
+        for inicio in range(0, len(job_ids), 500):
+            bloco = job_ids[inicio:inicio + 500]
+            encontrados.update(job_id for job_id, in self._executar(
+                f"SELECT job_id FROM trabalhos WHERE aplicado = 0 AND job_id IN ({','.join('?' * len(bloco))})",
+                bloco,
+            ))
+        return encontrados
+
+    def _acompanhar(self) -> None:
+        ultima_manutencao = 0.0
+        while True:
+            try:
+                if time.monotonic() - ultima_manutencao >= INTERVALO_SINAL:
+                    self._recuperar_perdidos()
+                    self._limpar()
+                    ultima_manutencao = time.monotonic()
+                if not self._aplicar_concluidos():
+                    time.sleep(INTERVALO_CONSULTA)
+            except sqlite3.Error as e:
+                logger.error(f"FILA: Erro ao ler os resultados dos workers: {e}")
+                time.sleep(INTERVALO_SINAL)
+
+    def _aplicar_concluidos(self) -> int:
+        linhas = self._executar(
+            "SELECT job_id, payload, resultado, enfileirado_em, iniciado_em FROM trabalhos "
+            "WHERE estado = 'concluido' AND aplicado = 0 ORDER BY id"
+        )
+        for job_id, payload, resultado, enfileirado_em, iniciado_em in linhas:
+            if iniciado_em is not None:
+                espera = iniciado_em - enfileirado_em
+                self._esperas.append(espera)
+                metricas.observar("fila_espera_segundos", espera)
+            # Enviado por este processo: o payload original (com o Lote); senão, o que foi gravado
+            payload = self._locais.pop(job_id, None) or json.loads(payload)
+            try:
+                self._ao_concluir(job_id, payload, json.loads(resultado))
+            except Exception as e:
+                logger.error(f"JOB {job_id}: Erro ao registrar o resultado do worker: {e}")
+            self._executar("UPDATE trabalhos SET aplicado = 1 WHERE job_id = ?", (job_id,))
+            self._concluidos += 1
+        return len(linhas)
+
+    def _recuperar_perdidos(self) -> None:
+        """Encerra como falha as recargas de workers sem sinal de vida (não dá para saber se foram feitas)."""
+        perdidos = self._executar(
+            "SELECT job_id, worker FROM trabalhos WHERE estado = 'executando' AND worker NOT IN "
+            "(SELECT worker_id FROM workers WHERE visto_em >= ?)", (time.time() - WORKER_SEM_SINAL,)
+        )
+        for job_id, worker_id in perdidos:
+            logger.error(f"JOB {job_id}: O worker {worker_id} parou de responder durante a recarga.")
+            self.concluir(job_id, {'status': 'failed', 'message': MENSAGEM_WORKER_PERDIDO, 'titular': None})
+
+    def _limpar(self) -> None:
+        agora = time.time()
+        self._executar("DELETE FROM trabalhos WHERE aplicado = 1 AND concluido_em < ?",
+                       (agora - RETENCAO_CONCLUIDOS,))
+        self._executar("DELETE FROM workers WHERE visto_em < ?", (agora - RETENCAO_CONCLUIDOS,))
+
+    def workers_ativos(self) -> list:
+        """Estado publicado por cada worker que deu sinal de vida recentemente."""
+        linhas = self._executar("SELECT worker_id, estado, visto_em FROM workers WHERE visto_em >= ? "
+                                "ORDER BY worker_id", (time.time() - WORKER_SEM_SINAL,))
+        return [{"worker": worker_id, "visto_ha_segundos": round(time.time() - visto_em, 1), **json.loads(estado)}
+                for worker_id, estado, visto_em in linhas]
+
+    def estatisticas(self) -> dict:
+        esperas = sorted(self._esperas)
+        return {
+            "profundidade": self._contar("pendente"),
+            "capacidade": self.capacidade,
+            "workers": len(self.workers_ativos()),
+            "em_execucao": self._contar("executando"),
+            "enviados": self._enviados,
+            "rejeitados": self._rejeitados,
+            "concluidos": self._concluidos,
+            "espera_media_s": round(sum(esperas) / len(esperas), 3) if esperas else 0.0,
+            "espera_p95_s": round(esperas[int(0.95 * (len(esperas) - 1))], 3) if esperas else 0.0,
+            "espera_max_s": round(esperas[-1], 3) if esperas else 0.0,
+        }
+
+    # ===== Lado do worker =====
+    def reservar(self, worker_id: str, timeout: float = None):
+        """Pega o próximo trabalho pendente (job_id, payload), esperando até `timeout`; None se não houver."""
+        limite = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            linha = self._executar(
+                "UPDATE trabalhos SET estado = 'executando', worker = ?, iniciado_em = ? WHERE id = "
+                "(SELECT id FROM trabalhos WHERE estado = 'pendente' ORDER BY id LIMIT 1) "
+                "RETURNING job_id, payload", (worker_id, time.time())
+            )
+            if linha:
+                job_id, payload = linha[0]
+                return job_id, json.loads(payload)
+            if limite is not None and time.monotonic() >= limite:
+                return None
+            time.sleep(INTERVALO_CONSULTA)
+
+    def concluir(self, job_id: str, resultado: dict) -> None:
+        """Grava o resultado ({'status', 'message', 'titular'}); o app o registra na próxima consulta."""
+        self._executar(
+            "UPDATE trabalhos SET estado = 'concluido', resultado = ?, concluido_em = ? "
+            "WHERE job_id = ? AND estado != 'concluido'", (json.dumps(resultado), time.time(), job_id)
+        )
+
+    def sinal_de_vida(self, worker_id: str, estado: dict) -> None:
+        self._executar(
+            "INSERT INTO workers (worker_id, estado, visto_em) VALUES (?, ?, ?) ON CONFLICT (worker_id) "
+            "DO UPDATE SET estado = excluded.estado, visto_em = excluded.visto_em",
+            (worker_id, json.dumps(estado), time.time()),
+        )
+
+    def remover_worker(self, worker_id: str) -> None:
+        self._executar("DELETE FROM workers WHERE worker_id = ?", (worker_id,))
@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import deque
+
+from utils.logger import logger
+from utils.metrics import metricas
+
+# Quantas esperas recentes guardamos para calcular as estatísticas da fila
+AMOSTRAS_ESPERA = 500
+
+
+class FilaCheia(Exception):
+    """A fila de recargas atingiu a capacidade máxima."""
+
+
+class JobQueue:
+    """
+    Fila FIFO limitada com um número fixo de workers.
+
+    Os workers chamam `executor(job_id, payload)` para cada trabalho. Quando a
+    fila está cheia, `enviar` falha na hora com FilaCheia em vez de acumular
+    threads, o que permite ao endpoint responder 503 imediatamente.
+    """
+
+    def __init__(self, executor, workers: int, capacidade: int):
+        self._executor = executor
+        self.workers = max(1, workers)
+        self.capacidade = max(1, capacidade)
+        self._pendentes = deque()  # (job_id, payload, enfileirado_em)
+        self._cond = threading.Condition()
+        self._threads = []
+        self._em_execucao = 0
+        self._enviados = 0
+        self._rejeitados = 0
+        self._concluidos = 0
+        self._esperas = deque(maxlen=AMOSTRAS_ESPERA)
+
+    def iniciar(self) -> None:
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f"recarga-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def enviar(self, job_id: str, payload, bloquear: bool = False, timeout: float = None) -> int:
+        """Enfileira um trabalho e devolve sua posição na fila (1 = próximo)."""
+        with self._cond:
+            if len(self._pendentes) >= self.capacidade:
+                if not bloquear or not self._cond.wait_for(
+                    lambda: len(self._pendentes) < self.capacidade, timeout=timeout
+                ):
+                    self._rejeitados += 1
+                    raise FilaCheia(f"Fila cheia ({self.capacidade} recargas aguardando).")
+            self._pendentes.append((job_id, payload, time.monotonic()))
+            self._enviados += 1
+            self._cond.notify_all()
+            return len(self._pendentes)
+
+    def posicao(self, job_id: str):
+        """Posição do trabalho na fila (1 = próximo) ou None se já saiu dela."""
+        with self._cond:
+            for posicao, (pendente_id, _, _) in enumerate(self._pendentes, start=1):
+                if pendente_id == job_id:
+                    return posicao
+        return None
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pendentes)
+                job_id, payload, enfileirado_em = self._pendentes.popleft()
+                espera = time.monotonic() - enfileirado_em
+                self._esperas.append(espera)
+                metricas.observar("fila_espera_segundos", espera)
+                self._em_execucao += 1
+                # Libera quem estava bloqueado esperando espaço na fila
+                self._cond.notify_all()
+            try:
+                self._executor(job_id, payload)
+            except Exception as e:
+                logger.error(f"JOB {job_id}: Erro não tratado no worker: {e}")
+            finally:
+                with self._cond:
+                    self._em_execucao -= 1
+                    self._concluidos += 1
+
+    def estatisticas(self) -> dict:
+        with self._cond:
+            esperas = sorted(self._esperas)
+            return {
+                "profundidade": len(self._pendentes),
+                "capacidade": self.capacidade,
+                "workers": self.workers,
+                "em_execucao": self._em_execucao,
+                "enviados": self._enviados,
+                "rejeitados": self._rejeitados,
+                "concluidos": self._concluidos,
+                "espera_media_s": round(sum(esperas) / len(esperas), 3) if esperas else 0.0,
+                "espera_p95_s": round(esperas[int(0.95 * (len(esperas) - 1))], 3) if esperas else 0.0,
+                "espera_max_s": round(esperas[-1], 3) if esperas else 0.0,
+            }
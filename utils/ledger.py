@@ -0,0 +1,288 @@
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+from collections import namedtuple
+from concurrent.futures import Future
+from contextlib import closing
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+from pathlib import Path
+
+from config import LEDGER_PATH
+from utils.daily_summary import ResumoDiario
+from utils.logger import logger
+from utils.metrics import metricas
+
+# Tempo máximo (s) que o escritor espera juntando registros antes de um commit
+JANELA_GROUP_COMMIT = 0.005
+# Máximo de registros por commit
+MAX_POR_COMMIT = 500
+# Espera (s) antes de regravar registros de um commit que falhou; dobra a cada falha até o máximo
+ESPERA_RETENTATIVA = 0.5
+ESPERA_RETENTATIVA_MAXIMA = 30
+
+SQL_INSERIR = (
+    "INSERT OR IGNORE INTO recargas "
+    "(task_id, criado_em, data, forma_pagamento, nome, valor_centavos, cartao) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS recargas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id TEXT UNIQUE,
+    criado_em TEXT NOT NULL,
+    data TEXT NOT NULL,
+    forma_pagamento TEXT NOT NULL,
+    nome TEXT NOT NULL DEFAULT '',
+    valor_centavos INTEGER NOT NULL,
+    cartao TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_recargas_data ON recargas (data);
+CREATE INDEX IF NOT EXISTS idx_recargas_cartao ON recargas (cartao);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    nome TEXT PRIMARY KEY,
+    ultimo_id INTEGER NOT NULL
+);
+"""
+
+CAMPOS = "id, task_id, criado_em, data, forma_pagamento, nome, valor_centavos, cartao"
+
+Recarga = namedtuple("Recarga", CAMPOS.replace(",", ""))
+
+
+def valor_em_centavos(valor) -> int:
+    """Converte '5,50', '5.50', 5.5 ou Decimal para centavos (inteiro)."""
+    decimal = Decimal(str(valor).strip().replace(",", "."))
+    return int((decimal * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+class Ledger:
+    """
+    Livro de recargas em SQLite (modo WAL), apenas com inserções.
+
+    `registrar` só coloca o registro numa fila em memória e retorna; uma
+    thread escritora junta tudo o que chegou em poucos milissegundos e grava
+    num único commit (group commit), então vários workers podem registrar ao
+    mesmo tempo sem disputar o arquivo e sem pagar um fsync cada. Se um
+    commit falha, os registros de quem não está esperando ficam retidos e
+    entram no commit seguinte; quem espera recebe o erro.
+
+    `resumo` guarda os totais por dia/forma/hora: montado do arquivo ao abrir
+    o livro e atualizado a cada commit.
+    """
+
+    def __init__(self, caminho: str = LEDGER_PATH):
+        self.caminho = caminho
+        self.resumo = ResumoDiario()
+        with closing(self._conectar()) as conn, conn:
+            conn.executescript(ESQUEMA)
+            self.resumo.carregar(conn.execute(
+                "SELECT data, CAST(substr(criado_em, 12, 2) AS INTEGER), forma_pagamento, "
+                "COUNT(*), SUM(valor_centavos) FROM recargas GROUP BY 1, 2, 3"
+            ))
+        self._fila = queue.Queue()
+        self._escritor = threading.Thread(target=self._loop_escritor, name="ledger-escritor", daemon=True)
+        self._escritor.start()
+
+    def _conectar(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.caminho, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Com WAL, FULL faz um fsync por commit (ou seja, por lote)
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    @staticmethod
+    def _linha(task_id, forma_pagamento, nome, valor, cartao, agora: datetime) -> tuple:
+        return (
+            task_id,
+            agora.isoformat(timespec="seconds"),
+            agora.strftime("%Y-%m-%d"),
+            forma_pagamento,
+            nome or "",
+            valor_em_centavos(valor),
+            str(cartao),
+        )
+
+    def registrar(self, task_id, forma_pagamento, nome, valor, cartao, aguardar: bool = False) -> None:
+        """
+        Enfileira uma recarga para gravação. Com `aguardar=True`, só retorna
+        após o fsync e levanta sqlite3.Error se o commit falhou.
+        """
+        self.registrar_lote([(task_id, forma_pagamento, nome, valor, cartao)], aguardar)
+
+    def registrar_lote(self, registros, aguardar: bool = False) -> None:
+        """
+        Enfileira várias recargas (task_id, forma, nome, valor, cartão) para
+        serem gravadas juntas, no mesmo commit. Com `aguardar=True`, levanta
+        o sqlite3.Error de um commit que falhou; os registros não ficam
+        retidos e quem chamou decide o que fazer com eles.
+        """
+        agora = datetime.now()
+        linhas = [self._linha(*registro, agora) for registro in registros]
+        if not linhas:
+            return
+        gravado = Future() if aguardar else None
+        self._fila.put((linhas, gravado))
+        if gravado is not None:
+            gravado.result()
+
+    def _somar_ao_resumo(self, linhas) -> None:
+        for _, criado_em, data, forma_pagamento, _, valor_centavos, _ in linhas:
+            self.resumo.registrar(data, int(criado_em[11:13]), forma_pagamento, valor_centavos)
+
+    @staticmethod
+    def _gravar(conn, linhas) -> list:
+        """Grava as linhas num único commit e devolve as que entraram (task_id repetido fica de fora)."""
+        with metricas.medir("ledger_commit"), conn:
+            return [linha for linha in linhas if conn.execute(SQL_INSERIR, linha).rowcount]
+
+    def _loop_escritor(self) -> None:
+        conn = self._conectar()
+        retidas = []  # linhas de um commit que falhou, regravadas no próximo
+        espera = ESPERA_RETENTATIVA
+        encerrando = False
+        while True:
+            try:
+                item = self._fila.get(timeout=espera if retidas else None)
+            except queue.Empty:
+                item = ([], None)
+            if item is None:
+                if not retidas:
+                    break
+                # Última tentativa para as linhas retidas antes de encerrar
+                encerrando, item = True, ([], None)
+            lote = [item]
+            quantidade = len(retidas) + len(item[0])
+            # Junta o que chegar durante a janela de group commit
+            try:
+                while not encerrando and quantidade < MAX_POR_COMMIT:
+                    item = self._fila.get(timeout=JANELA_GROUP_COMMIT)
+                    if item is None:
+                        self._fila.put(None)
+                        break
+                    lote.append(item)
+                    quantidade += len(item[0])
+            except queue.Empty:
+                pass
+            linhas = retidas + [linha for linhas_item, _ in lote for linha in linhas_item]
+            try:
+                inseridas = self._gravar(conn, linhas)
+            except sqlite3.Error as e:
+                logger.error(f"LEDGER: Erro ao gravar {quantidade} recargas: {e}")
+                metricas.incrementar("ledger_erros_total")
+                # Quem espera recebe o erro; o resto fica retido para o próximo commit
+                retidas = retidas + [linha for linhas_item, gravado in lote if gravado is None
+                                     for linha in linhas_item]
+                for _, gravado in lote:
+                    if gravado is not None:
+                        gravado.set_exception(e)
+                if encerrando:
+                    logger.error(f"LEDGER: {len(retidas)} recargas não foram gravadas ao encerrar.")
+                    break
+                espera = min(espera * 2, ESPERA_RETENTATIVA_MAXIMA)
+                continue
+            retidas, espera = [], ESPERA_RETENTATIVA
+            # Só o que entrou de fato vai para os totais (task_id repetido é ignorado pelo INSERT)
+            self._somar_ao_resumo(inseridas)
+            metricas.incrementar("ledger_registros_total", len(inseridas))
+            for _, gravado in lote:
+                if gravado is not None:
+                    gravado.set_result(None)
+            if encerrando:
+                break
+        conn.close()
+
+    def listar(self, data: str = None, cartao: str = None, forma_pagamento: str = None,
+               apos_id: int = 0, limite: int = None) -> list:
+        """Consulta recargas por data (AAAA-MM-DD), cartão e/ou forma de pagamento, em ordem de gravação."""
+        filtros, parametros = ["id > ?"], [apos_id]
+        if data:
+            filtros.append("data = ?")
+            parametros.append(data)
+        if cartao:
+            filtros.append("cartao = ?")
+            parametros.append(str(cartao))
+        if forma_pagamento:
+            filtros.append("forma_pagamento = ?")
+            parametros.append(forma_pagamento)
+        sql = f"SELECT {CAMPOS} FROM recargas WHERE {' AND '.join(filtros)} ORDER BY id"
+        if limite:
+            sql += f" LIMIT {int(limite)}"
+        conn = self._conectar()
+        try:
+            return [Recarga(*linha) for linha in conn.execute(sql, parametros)]
+        finally:
+            conn.close()
+
+    def ler_checkpoint(self, nome: str) -> int:
+        """Último id já processado por um consumidor (ex.: sincronização com o Sheets)."""
+        conn = self._conectar()
+        try:
+            linha = conn.execute("SELECT ultimo_id FROM checkpoints WHERE nome = ?", (nome,)).fetchone()
+            return linha[0] if linha else 0
+        finally:
+            conn.close()
+
+    def salvar_checkpoint(self, nome: str, ultimo_id: int) -> None:
+        with closing(self._conectar()) as conn, conn:
+            conn.execute(
+                "INSERT INTO checkpoints (nome, ultimo_id) VALUES (?, ?) "
+                "ON CONFLICT (nome) DO UPDATE SET ultimo_id = excluded.ultimo_id",
+                (nome, ultimo_id),
+            )
+
+    def importar_txt(self, caminho: str = "recargas.txt") -> int:
+        """Importa o antigo recargas.txt (nome,valor,cartao de PIX) usando a data do arquivo."""
+        data_arquivo = datetime.fromtimestamp(os.path.getmtime(caminho))
+        linhas = []
+        with open(caminho, "r", encoding="utf-8") as f:
+            for linha in f:
+                linha_limpa = linha.strip()
+                if not linha_limpa:
+                    continue
+                # rsplit: vírgulas no nome do pagador não quebram a leitura
+                nome, valor, cartao = linha_limpa.rsplit(",", 2)
+                linhas.append((None, data_arquivo.isoformat(timespec="seconds"),
+                               data_arquivo.strftime("%Y-%m-%d"), "PIX", nome,
+                               valor_em_centavos(valor), cartao))
+        with closing(self._conectar()) as conn, conn:
+            conn.executemany(
+                "INSERT INTO recargas "
+                "(task_id, criado_em, data, forma_pagamento, nome, valor_centavos, cartao) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                linhas,
+            )
+        self._somar_ao_resumo(linhas)
+        return len(linhas)
+
+    def fechar(self) -> None:
+        """Grava o que ainda estiver na fila e encerra a thread escritora."""
+        self._fila.put(None)
+        self._escritor.join()
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def obter_ledger() -> Ledger:
+    """Abre o livro na primeira chamada, migrando um recargas.txt antigo se existir."""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = Ledger()
+            atexit.register(_ledger.fechar)
+            antigo = Path("recargas.txt")
+            if antigo.exists():
+                quantidade = _ledger.importar_txt(str(antigo))
+                # O fluxo antigo já subia essas linhas manualmente para o Sheets;
+                # marcá-las como sincronizadas evita duplicá-las na planilha.
+                importadas = _ledger.listar()
+                if importadas:
+                    _ledger.salvar_checkpoint("google_sheets", importadas[-1].id)
+                antigo.rename(antigo.with_suffix(".txt.importado"))
+                logger.info(f"LEDGER: {quantidade} recargas importadas de {antigo}.")
+        return _ledger
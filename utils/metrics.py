@@ -0,0 +1,160 @@
+import math
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from config import METRICS_ENABLED
+
+# Histograma log-linear (no estilo HDR): 4 baldes por potência de 2, de 0,5 ms a ~3 min.
+# Cada balde é ~19% maior que o anterior, então os percentis têm erro de no máximo ~9%.
+BALDES_POR_OITAVA = 4
+MENOR_LIMITE = 0.0005
+LIMITES = [MENOR_LIMITE * 2 ** (i / BALDES_POR_OITAVA) for i in range(19 * BALDES_POR_OITAVA)]
+
+_NULO = nullcontext()
+
+
+def _escapar(valor) -> str:
+    """Escapa o valor de um rótulo no formato texto do Prometheus."""
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histograma:
+    __slots__ = ("baldes", "contagem", "soma", "maximo")
+
+    def __init__(self):
+        self.baldes = [0] * (len(LIMITES) + 1)  # o último é o +Inf
+        self.contagem = 0
+        self.soma = 0.0
+        self.maximo = 0.0
+
+    def observar(self, valor: float) -> None:
+        if valor <= MENOR_LIMITE:
+            indice = 0
+        else:
+            indice = min(len(LIMITES), math.ceil(math.log2(valor / MENOR_LIMITE) * BALDES_POR_OITAVA))
+            # Corrige arredondamentos de ponto flutuante na borda do balde
+            if indice < len(LIMITES) and valor > LIMITES[indice]:
+                indice += 1
+        self.baldes[indice] += 1
+        self.contagem += 1
+        self.soma += valor
+        if valor > self.maximo:
+            self.maximo = valor
+
+    def percentil(self, p: float) -> float:
+        if not self.contagem:
+            return 0.0
+        alvo = p / 100 * self.contagem
+        acumulado = 0
+        for indice, quantidade in enumerate(self.baldes):
+            acumulado += quantidade
+            if acumulado >= alvo:
+                return min(LIMITES[indice], self.maximo) if indice < len(LIMITES) else self.maximo
+        return self.maximo
+
+
+class Metricas:
+    """
+    Contadores e histogramas de latência em memória, com exposição no formato
+    texto do Prometheus e num resumo JSON. Com `ativo=False` todas as chamadas
+    viram no-op (sem lock, sem relógio).
+    """
+
+    def __init__(self, ativo: bool = METRICS_ENABLED):
+        self.ativo = ativo
+        self._lock = threading.Lock()
+        self._contadores = {}
+        self._histogramas = {}
+
+    @staticmethod
+    def _chave(nome, rotulos):
+        return nome, tuple(sorted(rotulos.items()))
+
+    def incrementar(self, nome: str, valor: float = 1, **rotulos) -> None:
+        if not self.ativo:
+            return
+        chave = self._chave(nome, rotulos)
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0) + valor
+
+    def observar(self, nome: str, segundos: float, **rotulos) -> None:
+        if not self.ativo:
+            return
+        chave = self._chave(nome, rotulos)
+        with self._lock:
+            histograma = self._histogramas.get(chave)
+            if histograma is None:
+                histograma = self._histogramas[chave] = Histograma()
+            histograma.observar(segundos)
+
+    def medir(self, etapa: str, **rotulos):
+        """Context manager que cronometra uma etapa em `etapa_segundos{etapa=...}`."""
+        if not self.ativo:
+            return _NULO
+        return self._medir(etapa, rotulos)
+
+    @contextmanager
+    def _medir(self, etapa, rotulos):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar("etapa_segundos", time.perf_counter() - inicio, etapa=etapa, **rotulos)
+
+    # ===== Exposição =====
+    @staticmethod
+    def _formatar_rotulos(rotulos, extra=()):
+        pares = list(rotulos) + list(extra)
+        if not pares:
+            return ""
+        return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in pares) + "}"
+
+    def prometheus(self) -> str:
+        with self._lock:
+            contadores = dict(self._contadores)
+            histogramas = {k: (list(h.baldes), h.contagem, h.soma) for k, h in self._histogramas.items()}
+        linhas = []
+        for nome in sorted({n for n, _ in contadores}):
+            linhas.append(f"# TYPE mcard_{nome} counter")
+            for (n, rotulos), valor in sorted(contadores.items()):
+                if n == nome:
+                    linhas.append(f"mcard_{nome}{self._formatar_rotulos(rotulos)} {valor}")
+        for nome in sorted({n for n, _ in histogramas}):
+            linhas.append(f"# TYPE mcard_{nome} histogram")
+            for (n, rotulos), (baldes, contagem, soma) in sorted(histogramas.items()):
+                if n != nome:
+                    continue
+                acumulado = 0
+                for limite, quantidade in zip(LIMITES + [math.inf], baldes):
+                    acumulado += quantidade
+                    le = "+Inf" if limite == math.inf else f"{limite:.6g}"
+                    linhas.append(f"mcard_{nome}_bucket{self._formatar_rotulos(rotulos, [('le', le)])} {acumulado}")
+                linhas.append(f"mcard_{nome}_sum{self._formatar_rotulos(rotulos)} {soma}")
+                linhas.append(f"mcard_{nome}_count{self._formatar_rotulos(rotulos)} {contagem}")
+        return "\n".join(linhas) + "\n"
+
+    def resumo(self) -> dict:
+        with self._lock:
+            contadores = [
+                {"nome": nome, "rotulos": dict(rotulos), "valor": valor}
+                for (nome, rotulos), valor in sorted(self._contadores.items())
+            ]
+            latencias = [
+                {
+                    "nome": nome,
+                    "rotulos": dict(rotulos),
+                    "contagem": h.contagem,
+                    "media_s": round(h.soma / h.contagem, 4) if h.contagem else 0.0,
+                    "p50_s": round(h.percentil(50), 4),
+                    "p95_s": round(h.percentil(95), 4),
+                    "p99_s": round(h.percentil(99), 4),
+                    "max_s": round(h.maximo, 4),
+                }
+                for (nome, rotulos), h in sorted(self._histogramas.items())
+            ]
+        return {"ativo": self.ativo, "contadores": contadores, "latencias": latencias}
+
+
+# Instância única usada por todo o aplicativo
+metricas = Metricas()
@@ -0,0 +1,190 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from config import TASK_STORE_MAX, TASK_STORE_PATH, TASK_STORE_TTL
+from utils.logger import logger
+
+# Estados em que a tarefa não muda mais
+ESTADOS_FINAIS = ("completed", "failed")
+
+# Mensagem das tarefas que estavam em andamento quando o app foi encerrado
+MENSAGEM_INTERROMPIDA = "O aplicativo foi reiniciado durante esta recarga. Confira no MCard se ela foi concluída."
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS tarefas (
+    task_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    message TEXT NOT NULL,
+    atualizada_em REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tarefas_atualizada_em ON tarefas (atualizada_em);
+"""
+
+
+class Tarefa:
+    """Registro compacto de uma tarefa (sem __dict__ por instância)."""
+
+    __slots__ = ("status", "message", "versao", "atualizada_em")
+
+    def __init__(self, status: str, message: str, versao: int, atualizada_em: float):
+        self.status = status
+        self.message = message
+        self.versao = versao
+        self.atualizada_em = atualizada_em
+
+    def publico(self) -> dict:
+        return {"status": self.status, "message": self.message}
+
+
+class TaskStore:
+    """
+    Estado das tarefas de recarga, seguro entre threads.
+
+    Cada alteração acorda quem está esperando na condição, então o long-poll
+    e o stream SSE do /status respondem no instante em que a recarga termina,
+    sem polling. O tamanho é limitado (`max_tarefas`, descartando as mais
+    antigas) e cada tarefa expira `ttl` segundos após a última alteração.
+    Com `caminho`, o estado também é gravado em SQLite e recarregado ao
+    reiniciar o aplicativo. `em_andamento(task_ids)` devolve quais das
+    tarefas não finalizadas ainda vão terminar sem este processo (ex.: na
+    fila dos workers); só as demais são marcadas como interrompidas.
+    """
+
+    def __init__(self, max_tarefas: int = TASK_STORE_MAX, ttl: float = TASK_STORE_TTL,
+                 caminho: str = TASK_STORE_PATH, em_andamento=None):
+        self.max_tarefas = max(1, max_tarefas)
+        self.ttl = ttl
+        self._em_andamento = em_andamento
+        self._tarefas = OrderedDict()  # ordenado pela última alteração
+        self._cond = threading.Condition()
+        self._conn = None
+        self._conn_lock = threading.Lock()
+        if caminho:
+            self._abrir(caminho)
+
+    # ===== Persistência =====
+    def _abrir(self, caminho: str) -> None:
+        self._conn = sqlite3.connect(caminho, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.executescript(ESQUEMA)
+            self._conn.execute("DELETE FROM tarefas WHERE atualizada_em < ?", (time.time() - self.ttl,))
+        linhas = self._conn.execute(
+            "SELECT task_id, status, message, atualizada_em FROM tarefas "
+            "ORDER BY atualizada_em DESC LIMIT ?", (self.max_tarefas,)
+        ).fetchall()
+        abertas = [task_id for task_id, status, _, _ in linhas if status not in ESTADOS_FINAIS]
+        continuam = self._em_andamento(abertas) if self._em_andamento and abertas else set()
+        interrompidas = []
+        for task_id, status, message, atualizada_em in reversed(linhas):
+            if status not in ESTADOS_FINAIS and task_id not in continuam:
+                status, message = "failed", MENSAGEM_INTERROMPIDA
+                interrompidas.append(task_id)
+            self._tarefas[task_id] = Tarefa(status, message, 1, atualizada_em)
+        for task_id in interrompidas:
+            self._gravar(task_id, self._tarefas[task_id])
+        if linhas:
+            logger.info(f"TASK STORE: {len(linhas)} tarefas recuperadas ({len(interrompidas)} interrompidas, "
+                        f"{len(continuam)} ainda em andamento).")
+
+    def _gravar(self, task_id: str, tarefa: Tarefa) -> None:
+        if self._conn is None:
+            return
+        try:
+            with self._conn_lock, self._conn:
+                self._conn.execute(
+                    "INSERT INTO tarefas (task_id, status, message, atualizada_em) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (task_id) DO UPDATE SET status = excluded.status, "
+                    "message = excluded.message, atualizada_em = excluded.atualizada_em",
+                    (task_id, tarefa.status, tarefa.message, tarefa.atualizada_em),
+                )
+        except sqlite3.Error as e:
+            logger.error(f"TASK STORE: Erro ao gravar a tarefa {task_id}: {e}")
+
+    def _apagar(self, task_ids: list) -> None:
+        if self._conn is None or not task_ids:
+            return
+        try:
+            with self._conn_lock, self._conn:
+                self._conn.executemany("DELETE FROM tarefas WHERE task_id = ?", [(t,) for t in task_ids])
+        except sqlite3.Error as e:
+            logger.error(f"TASK STORE: Erro ao apagar tarefas: {e}")
+
+    # ===== Despejo =====
+    def _despejar(self, agora: float) -> list:
+        """Remove as expiradas e as excedentes (as mais antigas saem primeiro)."""
+        removidas = []
+        while self._tarefas:
+            task_id, tarefa = next(iter(self._tarefas.items()))
+            if len(self._tarefas) <= self.max_tarefas and agora - tarefa.atualizada_em < self.ttl:
+                break
+            del self._tarefas[task_id]
+            removidas.append(task_id)
+        return removidas
+
+    # ===== API =====
+    def definir(self, task_id: str, status: str, message: str) -> None:
+        agora = time.time()
+        with self._cond:
+            anterior = self._tarefas.pop(task_id, None)
+            tarefa = Tarefa(status, message, anterior.versao + 1 if anterior else 1, agora)
+            self._tarefas[task_id] = tarefa
+            removidas = self._despejar(agora)
+            self._cond.notify_all()
+        self._gravar(task_id, tarefa)
+        self._apagar(removidas)
+
+    def obter(self, task_id: str):
+        """Cópia do estado da tarefa ({'status', 'message'}) ou None."""
+        with self._cond:
+            tarefa = self._tarefas.get(task_id)
+            return tarefa.publico() if tarefa else None
+
+    def remover(self, task_id: str) -> None:
+        with self._cond:
+            self._tarefas.pop(task_id, None)
+            self._cond.notify_all()
+        self._apagar([task_id])
+
+    def aguardar(self, task_id: str, versao: int = 0, timeout: float = None):
+        """
+        Espera até a tarefa passar da `versao` informada (ou sumir) e
+        devolve (estado, nova_versao). No timeout devolve o estado atual.
+        """
+        def mudou():
+            tarefa = self._tarefas.get(task_id)
+            return tarefa is None or tarefa.versao > versao
+
+        with self._cond:
+            self._cond.wait_for(mudou, timeout=timeout)
+            tarefa = self._tarefas.get(task_id)
+            if tarefa is None:
+                return None, versao
+            return tarefa.publico(), tarefa.versao
+
+    def aguardar_varias(self, versoes: dict, timeout: float = None) -> dict:
+        """
+        Espera até alguma das tarefas ({task_id: versao}) passar da versão
+        informada (ou sumir) e devolve {task_id: (estado, nova_versao)} só
+        das que mudaram. No timeout devolve um dicionário vazio.
+        """
+        def mudadas():
+            return [
+                task_id for task_id, versao in versoes.items()
+                if task_id not in self._tarefas or self._tarefas[task_id].versao > versao
+            ]
+
+        with self._cond:
+            alteradas = self._cond.wait_for(mudadas, timeout=timeout)
+            resultado = {}
+            for task_id in alteradas:
+                tarefa = self._tarefas.get(task_id)
+                resultado[task_id] = (tarefa.publico(), tarefa.versao) if tarefa else (None, versoes[task_id])
+            return resultado
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._tarefas)
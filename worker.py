@@ -0,0 +1,109 @@
+# worker.py
+"""
+Worker de recargas para EXECUTION_MODE=workers.
+
+O app só atende HTTP e grava as recargas na fila em SQLite (JOB_QUEUE_PATH);
+cada processo deste arquivo abre o seu próprio Chrome (WORKER_SESSIONS
+sessões), consome a fila e grava o resultado de volta, que o app registra
+no livro e entrega ao /status. Rode quantos processos quiser, por exemplo
+um por núcleo, cada um com um nome fixo (que também nomeia os perfis do
+Chrome em CHROME_PROFILE_DIR, reaproveitados quando o worker reinicia):
+
+    python worker.py w1
+
+Se o Chrome de um worker travar, só ele é reiniciado (pelo pool ou
+reiniciando o processo); o app e as recargas na fila continuam lá.
+"""
+
+import os
+import signal
+import socket
+import sys
+import threading
+
+from automation.pool import DriverPool
+from automation.recharge import executar_recarga
+from automation.session_manager import SessionKeeper
+from automation.waits import perfil_esperas
+from config import JOB_QUEUE_PATH, WORKER_SESSIONS
+from utils.durable_queue import FilaDuravel, INTERVALO_SINAL
+from utils.logger import logger
+
+# Tempo máximo (s) de cada espera por trabalho, para o worker perceber o pedido de parada
+ESPERA_TRABALHO = 1
+
+
+class Worker:
+    """Um processo consumidor da fila: pool próprio do Chrome e uma thread por sessão."""
+
+    def __init__(self, nome: str = None, sessoes: int = WORKER_SESSIONS, caminho: str = JOB_QUEUE_PATH):
+        self.worker_id = nome or f"{socket.gethostname()}-{os.getpid()}"
+        self.fila = FilaDuravel(caminho=caminho)
+        self.pool = DriverPool(tamanho=sessoes, perfil=self.worker_id)
+        self.mantenedor = SessionKeeper(self.pool)
+        self.parar = threading.Event()
+        self.recargas = 0
+
+    def _publicar_estado(self) -> None:
+        self.fila.sinal_de_vida(self.worker_id, {
+            "pid": os.getpid(),
+            "recargas": self.recargas,
+            "iniciando": self.pool.iniciando,
+            "sessoes_prontas": self.pool.prontas(),
+            "sessoes": self.pool.estado(),
+            "esperas": perfil_esperas.estado(),
+        })
+
+    def _sinal_de_vida(self) -> None:
+        while not self.parar.wait(INTERVALO_SINAL):
+            try:
+                self._publicar_estado()
+            except Exception as e:
+                logger.error(f"WORKER {self.worker_id}: Erro ao publicar o sinal de vida: {e}")
+
+    def _consumir(self) -> None:
+        while not self.parar.is_set():
+            trabalho = self.fila.reservar(self.worker_id, timeout=ESPERA_TRABALHO)
+            if trabalho is None:
+                continue
+            task_id, form_data = trabalho
+            resultado = executar_recarga(task_id, self.pool, form_data)
+            self.fila.concluir(task_id, resultado)
+            self.recargas += 1
+            logger.info(f"WORKER {self.worker_id}: Tarefa {task_id} concluída ({resultado['status']}).")
+
+    def executar(self) -> None:
+        # O sinal de vida começa antes do login, para o app não dar o worker como morto
+        self._publicar_estado()
+        threading.Thread(target=self._sinal_de_vida, name="worker-sinal", daemon=True).start()
+        if not self.pool.iniciar():
+            logger.error(f"WORKER {self.worker_id}: NÃO FOI POSSÍVEL FAZER LOGIN.")
+            self.parar.set()
+            self.fila.remover_worker(self.worker_id)
+            self.pool.encerrar()
+            raise SystemExit(1)
+        self.mantenedor.iniciar()
+        self._publicar_estado()
+        consumidores = [
+            threading.Thread(target=self._consumir, name=f"recarga-worker-{i}", daemon=True)
+            for i in range(self.pool.tamanho)
+        ]
+        for thread in consumidores:
+            thread.start()
+        logger.info(f"WORKER {self.worker_id}: Consumindo a fila em {JOB_QUEUE_PATH} "
+                    f"com {self.pool.tamanho} sessão(ões).")
+        # Termina as recargas em andamento antes de sair
+        for thread in consumidores:
+            while thread.is_alive():
+                thread.join(timeout=ESPERA_TRABALHO)
+        self.fila.remover_worker(self.worker_id)
+        self.pool.encerrar()
+        logger.info(f"WORKER {self.worker_id}: Encerrado.")
+
+
+if __name__ == "__main__":
+    worker = Worker(sys.argv[1] if len(sys.argv) > 1 else None)
+    # Ctrl+C ou SIGTERM: para de pegar trabalhos e termina os que estão em andamento
+    for sinal in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sinal, lambda *_: worker.parar.set())
+    worker.executar()